@@ -1,104 +1,130 @@
 # --- Imports ---
-from flask import Flask, json, request, render_template, url_for
+from flask import Flask, Response, json, jsonify, redirect, request, render_template, send_file, stream_with_context, url_for
 import requests
-from bs4 import BeautifulSoup
-import unicodedata
+import urllib3
+import click
 import re
-from fuzzywuzzy import fuzz
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import time # Importera time för sleep
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import asyncio
+import time
+import hashlib
 from urllib.parse import quote_plus # För att URL-koda IMDb-sökning
-
-logging.basicConfig(level=logging.DEBUG)
+from page_cache import PageCache
+import http_client
+import deadline
+from sfdb_page import SfdbMoviePage, extract_itemid_from_url
+from dcp_scan import detect_dcp
+from poster_worker import PosterResolver
+from title_index import TitleIndex
+from imdb_index import ImdbIndex, import_title_basics
+from scoring import normalize_title, title_score, score_titles
+from ranking import TopKPruner
+from watchlist import Watchlist
+import thumbnails
+from thumbnails import ThumbnailCache
+from compression import compress_response
+from singleflight import SingleFlight
+from batch import parse_programme, run_batch, iter_csv, iter_json, BatchTimer
+from html_parser import parse_html, SFDB_SEARCH_RESULTS, IMDB_FIND_RESULTS, IMDB_TITLE_POSTER
+from metrics import REGISTRY, STAGE_SECONDS, CANDIDATES_TOTAL
+
+# Loggnivå via LOG_LEVEL (t.ex. DEBUG vid felsökning). Debug-raderna i sökflödet formateras
+# först när nivån är aktiv, så de kostar inget i drift.
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 
 app = Flask(__name__)
 # app.config['TEMPLATES_AUTO_RELOAD'] = True
 
 # --- Konstanter ---
-SFDB_BASE_URL = "https://www.svenskfilmdatabas.se"
+SFDB_BASE_URL = http_client.SFDB_BASE_URL # Standard https://www.svenskfilmdatabas.se, kan sättas via miljövariabel
 SEARCH_URL_HTML = f"{SFDB_BASE_URL}/sv/"
-IMDB_SEARCH_URL = "https://www.imdb.com/find/" # Bas-URL för IMDb-sökning
-
-# --- Hjälpfunktioner (normalize_title, extract_itemid_from_url, get_sfdb_original_title oförändrade) ---
-
-def normalize_title(title):
-    """Normalisera titlar."""
-    if not title: return ""
-    try:
-        title_no_year = re.sub(r'\s*\(\d{4}\)$', '', title).strip()
-        title_no_year = title_no_year.replace(':', '').replace('[', '').replace(']', '')
-        title = unicodedata.normalize('NFKD', title_no_year).encode('ascii', 'ignore').decode('utf-8')
-        title = re.sub(r'[^a-zA-Z0-9\s]', '', title)
-        return title.lower().strip()
-    except Exception as e:
-        logging.warning(f"Kunde inte normalisera titel: {title} - Fel: {e}")
-        try:
-            return re.sub(r'[^a-zA-Z0-9\s]', '', title).lower().strip()
-        except:
-             return title.lower()
-
-def extract_itemid_from_url(url):
-    """Extraherar itemid från en SFDb URL."""
-    if not url: return None
-    match = re.search(r'itemid=(\d+)', url)
-    if match:
-        return match.group(1)
-    match = re.search(r'-(\d+)/?$', url)
-    if match:
-        return match.group(1)
-    return None
+IMDB_BASE_URL = http_client.IMDB_BASE_URL
+IMDB_SEARCH_URL = os.environ.get("IMDB_SEARCH_URL", f"{IMDB_BASE_URL}/find/") # Bas-URL för IMDb-sökning
+# Fel från uppströmsanrop: requests-undantag (även DeadlineExceeded) och urllib3-fel som
+# inte lindats in. De kastas vidare; bara parsningsfel räknas som "ingen träff".
+UPSTREAM_ERRORS = (requests.exceptions.RequestException, urllib3.exceptions.HTTPError)
+
+# --- Sidcache (minne + SQLite) för alla SFDb/IMDb-hämtningar ---
+PAGE_CACHE_PATH = os.environ.get("PAGE_CACHE_PATH", "page_cache.sqlite3")
+PAGE_CACHE_TTL_BY_HOST = {
+    http_client.SFDB_HOST: 6 * 3600, # SFDb-sidor ändras sällan
+    http_client.IMDB_HOST: 24 * 3600,
+}
+page_cache = PageCache(
+    db_path=PAGE_CACHE_PATH or None, # Tom sträng = endast minnescache
+    max_entries=int(os.environ.get("PAGE_CACHE_MAX_ENTRIES", 512)),
+    max_disk_entries=int(os.environ.get("PAGE_CACHE_MAX_DISK_ENTRIES", 20000)), # 0 = inget tak
+    ttl_by_host=PAGE_CACHE_TTL_BY_HOST,
+    fetch=http_client.client.get, # Poolade keep-alive-sessioner per värd
+)
+
+# --- Hjälpfunktioner (SFDb-filmsidor; normalize_title och extract_itemid_from_url importeras) ---
+
+def sfdb_movie_url(itemid):
+    """Kanonisk URL till en films SFDb-sida."""
+    return f"{SFDB_BASE_URL}/sv/item/?type=film&itemid={itemid}"
+
+def fetch_sfdb_movie_page(movie_page_url, max_age=None):
+    """Hämtar (via sidcachen) en SFDb filmsida och returnerar en SfdbMoviePage.
+
+    Kastar requests-undantag vid nätverksfel; parsning sker först när ett fält läses.
+    max_age kortar sidcachens TTL (se PageCache.get).
+    """
+    response = page_cache.get(movie_page_url, timeout=10, max_age=max_age)
+    response.raise_for_status()
+    return SfdbMoviePage(movie_page_url, response.text)
 
+@STAGE_SECONDS.time(stage="ot_fetch")
 def get_sfdb_original_title(movie_page_url):
-    """Hämtar originaltitel från en individuell SFDb filmsida."""
+    """Hämtar originaltitel från en individuell SFDb filmsida. Nätverksfel kastas."""
     original_title = None
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(movie_page_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        titles_heading = soup.find('h2', id='titles')
-        if titles_heading:
-            foldout_div = titles_heading.find_next_sibling('div', class_='accordion__foldout')
-            if foldout_div:
-                 info_table = foldout_div.select_one('table.information-table')
-                 if info_table:
-                     rows = info_table.find_all('tr')
-                     for row in rows:
-                         th = row.find('th')
-                         td = row.find('td')
-                         if th and td and 'originaltitel' in th.get_text(strip=True).lower():
-                             li = td.find('li')
-                             original_title_text = li.get_text(strip=True) if li else td.get_text(strip=True)
-                             if '(' in original_title_text and ')' in original_title_text:
-                                 ot_simple = re.sub(r'\s*\(.*\)$', '', original_title_text).strip()
-                                 if ot_simple: original_title = ot_simple
-                                 else: original_title = original_title_text
-                             else: original_title = original_title_text
-                             logging.debug(f"  > SFDb Originaltitel hittad: {original_title}")
-                             break
-        if not original_title:
-            logging.debug(f"  > Ingen SFDb originaltitel hittad i tabellen för {movie_page_url}")
-    except requests.exceptions.RequestException as e:
+        original_title = fetch_sfdb_movie_page(movie_page_url).original_title
+    except UPSTREAM_ERRORS as e:
         logging.error(f"Nätverksfel vid hämtning av SFDb originaltitel från {movie_page_url}: {e}")
+        raise
     except Exception as e:
         logging.error(f"Fel vid hämtning/parsing av SFDb originaltitel från {movie_page_url}: {e}")
     return original_title
 
+# --- Lokalt titelindex (valfritt, byggs med `flask --app app build-index <katalog>`) ---
+SFDB_INDEX_PATH = os.environ.get("SFDB_INDEX_PATH", "sfdb_index.sqlite3")
+title_index = TitleIndex(SFDB_INDEX_PATH, normalize_title) if SFDB_INDEX_PATH and os.path.exists(SFDB_INDEX_PATH) else None
+
+# --- Lokalt IMDb-index (valfritt, byggs med `flask --app app import-imdb title.basics.tsv.gz`) ---
+IMDB_INDEX_PATH = os.environ.get("IMDB_INDEX_PATH", "imdb_index") # Bas-sökväg för .keys/.offsets
+imdb_index = ImdbIndex(IMDB_INDEX_PATH, normalize_title) if IMDB_INDEX_PATH and ImdbIndex.exists(IMDB_INDEX_PATH) else None
+
 # --- NY FUNKTION: Hämta poster från IMDb via skrapning ---
 def get_imdb_poster(search_title, year=None, poster_size_param=""): # poster_size_param ignoreras ofta av IMDb nu
     """
     SÖKER på IMDb och skrapar bästa träffens sida för att hitta en poster URL.
     Returnerar URL (sträng) eller None. VARNING: Mycket bräcklig!
+    Nätverksfel (även slut på tidsbudget) kastas, så att de inte sparas som "ingen poster".
     """
     if not search_title:
         logging.warning("Tom söktitel skickades till get_imdb_poster.")
         return None
 
+    imdb_movie_url = None
+    if imdb_index is not None:
+        # tconst ur det lokala indexet: ingen sökning mot IMDb behövs
+        tconst = imdb_index.lookup(search_title, year)
+        if tconst: imdb_movie_url = f"{IMDB_BASE_URL}/title/{tconst}/"
+    if not imdb_movie_url:
+        imdb_movie_url = find_imdb_title_url(search_title, year)
+    if not imdb_movie_url:
+        return None # Ingen IMDb URL hittades i sökningen
+    return scrape_imdb_poster(imdb_movie_url)
+
+@STAGE_SECONDS.time(stage="imdb_search")
+def find_imdb_title_url(search_title, year=None):
+    """Steg 1: Söker på IMDb och returnerar URL:en till bästa träffens filmsida, eller None."""
     normalized_search_title = normalize_title(search_title)
-    logging.debug(f"  > Söker på IMDb: Titel='{search_title}' ({normalized_search_title}), År={year}")
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)', 'Accept-Language': 'en-US,en;q=0.9'} # Be om engelska
+    logging.debug("  > Söker på IMDb: Titel='%s' (%s), År=%s", search_title, normalized_search_title, year)
 
     # --- Steg 1: Sök på IMDb ---
     imdb_movie_url = None
@@ -108,10 +134,10 @@ def get_imdb_poster(search_title, year=None, poster_size_param=""): # poster_siz
         # Använd quote_plus för att koda söktermen korrekt för URL:en
         imdb_search_params = {'q': search_query, 's': 'tt', 'ref_': 'fn_al_tt_1'}
         
-        logging.debug(f"  > IMDb Sök URL: {IMDB_SEARCH_URL} med params: {imdb_search_params}")
-        response = requests.get(IMDB_SEARCH_URL, params=imdb_search_params, headers=headers, timeout=15)
+        logging.debug("  > IMDb Sök URL: %s med params: %s", IMDB_SEARCH_URL, imdb_search_params)
+        response = page_cache.get(IMDB_SEARCH_URL, params=imdb_search_params, timeout=15)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
+        soup = parse_html(response.text, only=IMDB_FIND_RESULTS, document="imdb_find")
 
         # Hitta bästa träffen (detta är en GISSNING på IMDb:s struktur)
         # Försök med den modernare IPC-strukturen först
@@ -128,7 +154,7 @@ def get_imdb_poster(search_title, year=None, poster_size_param=""): # poster_siz
              logging.debug("  > IMDb: Använder fallback-selector '.findResult'.")
 
 
-        logging.debug(f"  > IMDb Sökning hittade {len(possible_results)} potentiella element.")
+        logging.debug("  > IMDb Sökning hittade %s potentiella element.", len(possible_results))
 
         for result in possible_results:
              # Extrahera titel, år och länk från resultatet (anpassa selectors!)
@@ -152,9 +178,9 @@ def get_imdb_poster(search_title, year=None, poster_size_param=""): # poster_siz
                        result_year = int(year_match_imdb.group(1))
 
              normalized_result_title = normalize_title(result_title_text)
-             score = fuzz.token_set_ratio(normalized_search_title, normalized_result_title)
+             score = title_score(normalized_search_title, normalized_result_title)
 
-             logging.debug(f"    - IMDb Kandidat: '{result_title_text}', År: {result_year}, Score: {score}, URL: {result_url}")
+             logging.debug("    - IMDb Kandidat: '%s', År: %s, Score: %s, URL: %s", result_title_text, result_year, score, result_url)
 
              # Prioritering: Bra score, och om år angavs, ska det matcha hyfsat
              current_match_score = score
@@ -172,104 +198,116 @@ def get_imdb_poster(search_title, year=None, poster_size_param=""): # poster_siz
              if is_good_match and current_match_score > best_match_score:
                   best_match_score = current_match_score
                   best_match_link = result_url
-                  logging.debug(f"      >> Ny bästa IMDb-match hittad!")
+                  logging.debug("      >> Ny bästa IMDb-match hittad!")
 
         if best_match_link:
-            imdb_movie_url = "https://www.imdb.com" + best_match_link
-            logging.debug(f"  > Bästa IMDb-match URL: {imdb_movie_url}")
+            imdb_movie_url = IMDB_BASE_URL + best_match_link
+            logging.debug("  > Bästa IMDb-match URL: %s", imdb_movie_url)
         else:
             logging.warning(f"  > Ingen bra IMDb-match hittades för '{search_title}' ({year}).")
             return None
 
-    except requests.exceptions.RequestException as e:
+    except UPSTREAM_ERRORS as e:
         logging.error(f"Nätverksfel vid sökning på IMDb: {e}")
-        return None
+        raise
     except Exception as e:
         logging.error(f"Fel vid parsing av IMDb sökresultat: {e}")
         return None
 
-    # --- Steg 2: Skrapa IMDb-filmsidan för poster ---
-    if imdb_movie_url:
-        try:
-            time.sleep(0.5) # Liten paus för att inte överbelasta IMDb
-            logging.debug(f"  > Hämtar IMDb-sida: {imdb_movie_url}")
-            response = requests.get(imdb_movie_url, headers=headers, timeout=15)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            # Hitta poster (GISSNINGAR på selectors - behöver verifieras!)
-            poster_src = None
-            # 1. Försök hitta via JSON-LD (ofta mer stabilt)
-            json_ld_script = soup.find('script', type='application/ld+json')
-            if json_ld_script:
-                try:
-                    json_data = json.loads(json_ld_script.string)
-                    if isinstance(json_data, dict) and json_data.get('@type') == 'Movie' and json_data.get('image'):
-                        poster_src = json_data['image']
-                        if isinstance(poster_src, dict): poster_src = poster_src.get('url') # Ibland är det ett objekt
-                        if poster_src and isinstance(poster_src, str):
-                             logging.debug(f"  > IMDb Poster hittad via JSON-LD: {poster_src}")
-                except Exception as json_e:
-                    logging.debug(f"  > Kunde inte parsa JSON-LD: {json_e}")
-
-            # 2. Försök via primär bild-selector (om JSON-LD misslyckas)
-            if not poster_src:
-                 # Anpassa selectorn! Kan vara t.ex. '[data-testid="hero-media__poster"] img'
-                 poster_img = soup.select_one('div[class*="poster"] img[class*="ipc-image"]') # Gissning
-                 if poster_img and poster_img.get('src'):
-                      poster_src = poster_img['src']
-                      logging.debug(f"  > IMDb Poster hittad via img selector: {poster_src}")
-
-            # 3. Fallback till og:image
-            if not poster_src:
-                 og_image = soup.find('meta', property='og:image')
-                 if og_image and og_image.get('content'):
-                      poster_src = og_image['content']
-                      logging.debug(f"  > IMDb Poster hittad via og:image: {poster_src}")
-
-            if poster_src:
-                 # IMDb ger ofta URL:er som funkar direkt
-                 # Kan behöva rensa bort storleksparametrar? T.ex. allt efter '._V1_'
-                 # poster_src = re.sub(r'\._V1_.*', '._V1_.jpg', poster_src) # Exempel på rensning
-                 logging.info(f"  > IMDb Poster funnen: {poster_src}")
-                 return poster_src
-            else:
-                 logging.warning(f"  > Kunde inte hitta poster på IMDb-sidan: {imdb_movie_url}")
-                 return None
-
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Nätverksfel vid hämtning av IMDb-filmsida: {e}")
-            return None
-        except Exception as e:
-            logging.error(f"Fel vid parsing av IMDb-filmsida: {e}")
-            return None
-    else:
-         return None # Ingen IMDb URL hittades i sökningen
+    return imdb_movie_url
 
+@STAGE_SECONDS.time(stage="imdb_title")
+def scrape_imdb_poster(imdb_movie_url):
+    """Steg 2: Skrapar en IMDb-filmsida efter poster-URL. Returnerar URL eller None."""
+    try:
+        logging.debug("  > Hämtar IMDb-sida: %s", imdb_movie_url)
+        response = page_cache.get(imdb_movie_url, timeout=15)
+        response.raise_for_status()
+        soup = parse_html(response.text, only=IMDB_TITLE_POSTER, document="imdb_title")
 
-# --- Kärnlogik (search_movie anropar nu IMDb för poster) ---
+        # Hitta poster (GISSNINGAR på selectors - behöver verifieras!)
+        poster_src = None
+        # 1. Försök hitta via JSON-LD (ofta mer stabilt)
+        json_ld_script = soup.find('script', type='application/ld+json')
+        if json_ld_script:
+            try:
+                json_data = json.loads(json_ld_script.string)
+                if isinstance(json_data, dict) and json_data.get('@type') == 'Movie' and json_data.get('image'):
+                    poster_src = json_data['image']
+                    if isinstance(poster_src, dict): poster_src = poster_src.get('url') # Ibland är det ett objekt
+                    if poster_src and isinstance(poster_src, str):
+                         logging.debug("  > IMDb Poster hittad via JSON-LD: %s", poster_src)
+            except Exception as json_e:
+                logging.debug("  > Kunde inte parsa JSON-LD: %s", json_e)
+
+        # 2. Försök via primär bild-selector (om JSON-LD misslyckas)
+        if not poster_src:
+             # Anpassa selectorn! Kan vara t.ex. '[data-testid="hero-media__poster"] img'
+             poster_img = soup.select_one('div[class*="poster"] img[class*="ipc-image"]') # Gissning
+             if poster_img and poster_img.get('src'):
+                  poster_src = poster_img['src']
+                  logging.debug("  > IMDb Poster hittad via img selector: %s", poster_src)
+
+        # 3. Fallback till og:image
+        if not poster_src:
+             og_image = soup.find('meta', property='og:image')
+             if og_image and og_image.get('content'):
+                  poster_src = og_image['content']
+                  logging.debug("  > IMDb Poster hittad via og:image: %s", poster_src)
+
+        if poster_src:
+             # IMDb ger ofta URL:er som funkar direkt
+             # Kan behöva rensa bort storleksparametrar? T.ex. allt efter '._V1_'
+             # poster_src = re.sub(r'\._V1_.*', '._V1_.jpg', poster_src) # Exempel på rensning
+             logging.info(f"  > IMDb Poster funnen: {poster_src}")
+             return poster_src
+        else:
+             logging.warning(f"  > Kunde inte hitta poster på IMDb-sidan: {imdb_movie_url}")
+             return None
 
-def search_movie(title, year=None):
-    """Söker via HTML-skrapning och hämtar poster från IMDb."""
-    params = {"s": title}
-    headers = {'User-Agent': 'Mozilla/5.0'}
+    except UPSTREAM_ERRORS as e:
+        logging.error(f"Nätverksfel vid hämtning av IMDb-filmsida: {e}")
+        raise
+    except Exception as e:
+        logging.error(f"Fel vid parsing av IMDb-filmsida: {e}")
+        return None
 
-    initial_results = []
-    normalized_input_title = normalize_title(title)
-    input_year = None
-    if year and year.isdigit(): input_year = int(year)
 
-    logging.info(f"Startar HTML-skrapning för: '{title}', År: {year}")
-    logging.debug(f"Normaliserad input: '{normalized_input_title}'")
+# --- Kärnlogik (search_movie anropar nu IMDb för poster) ---
 
-    # --- Steg 1: Hämta kandidater från SFDb HTML ---
+SCORE_THRESHOLD = 65 # Behåll tröskeln
+MAX_RESULTS = 6
+OT_CONCURRENCY = 5 # Samtidiga SFDb-hämtningar av originaltitel per sökning
+# Max antal originaltitelhämtningar per sökning. Kandidater som inte hinner hämtas
+# poängsätts på svensk titel och år från träfflistan.
+OT_FETCH_BUDGET = int(os.environ.get("OT_FETCH_BUDGET", 12))
+POSTER_WORKERS = 3 # Färre samtidiga anrop mot IMDb
+# Tidsbudget per inkommande request (sekunder, 0 = ingen). Uppströmsanropen får sina
+# timeouts ur den återstående budgeten; när den är slut svarar vi med det vi hunnit få
+# (kandidater utan originaltitel, träffar utan poster) i stället för att vänta vidare.
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", 10))
+
+# En delad trådpool för alla blockerande hämtningar i sökflödet, i stället för
+# två nya pooler per HTTP-request. Semaforerna i search_movie_async begränsar
+# hur mycket av poolen en enskild sökning får använda.
+SCRAPE_POOL_SIZE = int(os.environ.get("SCRAPE_POOL_SIZE", 16))
+scrape_executor = ThreadPoolExecutor(max_workers=SCRAPE_POOL_SIZE, thread_name_prefix="scrape")
+
+@STAGE_SECONDS.time(stage="sfdb_search")
+def fetch_sfdb_candidates(title):
+    """Steg 1: Hämtar filmkandidater från SFDb:s HTML-sökning. Returnerar lista av dicts.
+
+    Nätverksfel kastas, så att "SFDb svarade inte" kan skiljas från "inga träffar".
+    """
+    params = {"s": title}
+    initial_results = []
     try:
-        response = requests.get(SEARCH_URL_HTML, params=params, headers=headers, timeout=15)
+        response = page_cache.get(SEARCH_URL_HTML, params=params, timeout=15)
         response.raise_for_status()
-        logging.debug(f"Hämtade HTML från: {response.url}")
-        soup = BeautifulSoup(response.text, "html.parser")
+        logging.debug("Hämtade HTML från: %s", response.url)
+        soup = parse_html(response.text, only=SFDB_SEARCH_RESULTS, document="sfdb_search")
         result_items = soup.select('ul.list li.list__item')
-        logging.debug(f"Hittade {len(result_items)} list__item element.")
+        logging.debug("Hittade %s list__item element.", len(result_items))
 
         for item in result_items:
             link_tag = item.select_one('a.list__link')
@@ -292,157 +330,492 @@ def search_movie(title, year=None):
             full_url = SFDB_BASE_URL + href if href.startswith('/') else href
             initial_results.append({'title_sv': movie_title_with_year, 'url': full_url, 'itemid': item_id})
 
-    except requests.exceptions.RequestException as e:
+    except UPSTREAM_ERRORS as e:
         logging.error(f"Nätverksfel vid skrapning av SFDb HTML-sida: {e}")
-        return []
+        raise
     except Exception as e:
         logging.error(f"Oväntat fel vid skrapning av SFDb HTML: {e}")
         return []
 
     logging.info(f"Hittade {len(initial_results)} filmkandidater i HTML-listan.")
-    if not initial_results: return []
+    return initial_results
 
-    # --- Steg 2: Hämta Originaltitel (parallellt) & Beräkna Scores & Hämta IMDb Poster ---
-    possible_matches = []
-    # Använd ThreadPoolExecutor för att hämta SFDb originaltitel snabbare
-    with ThreadPoolExecutor(max_workers=5) as executor_ot:
-        future_to_movie_ot = {executor_ot.submit(get_sfdb_original_title, movie['url']): movie for movie in initial_results}
-        processed_movies = {} # Spara resultat här med originaltitel
-
-        for future in as_completed(future_to_movie_ot):
-            initial_movie_data = future_to_movie_ot[future]
-            try:
-                original_title = future.result() # Hämta originaltitel
-                movie_title_with_year = initial_movie_data['title_sv']
-                logging.debug(f"\nBearbetar OT för: '{movie_title_with_year}'")
-
-                normalized_swedish_title = normalize_title(movie_title_with_year)
-                swedish_score = fuzz.token_set_ratio(normalized_input_title, normalized_swedish_title)
-                logging.debug(f"  Score (SV): {swedish_score} ('{normalized_swedish_title}')")
-
-                original_score = 0
-                if original_title:
-                    normalized_original_title = normalize_title(original_title)
-                    original_score = fuzz.token_set_ratio(normalized_input_title, normalized_original_title)
-                    logging.debug(f"  Score (OT): {original_score} ('{normalized_original_title}' from '{original_title}')")
-                else:
-                     logging.debug(f"  Score (OT): 0 (Ingen originaltitel hittades på SFDb)")
-
-                score = max(swedish_score, original_score)
-                logging.debug(f"  >> Max Score: {score}")
-
-                found_year = None
-                year_match = re.search(r'\((\d{4})\)$', movie_title_with_year.strip())
-                if year_match: found_year = int(year_match.group(1))
-
-                year_diff = float('inf')
-                if input_year and found_year: year_diff = abs(input_year - found_year)
-                logging.debug(f"  År: {found_year}, Årsdiff: {year_diff}")
-
-                score_threshold = 65 # Behåll tröskeln
-                if score >= score_threshold:
-                    logging.debug(f"    >> PASSERADE TRÖSKEL ({score} >= {score_threshold})")
-                    # Spara data för nästa steg (posterhämtning)
-                    processed_movies[initial_movie_data['itemid']] = {
-                        "title": movie_title_with_year,
-                        "year": found_year,
-                        "url": initial_movie_data['url'],
-                        "itemid": initial_movie_data['itemid'],
-                        "original_title": original_title, # Spara originaltitel för IMDb-sökning
-                        "score": score,
-                        "year_diff": year_diff
-                    }
-                else:
-                    logging.debug(f"    >> IGNORERAD ({score} < {score_threshold})")
+def find_index_candidates(title):
+    """Kandidater ur det lokala titelindexet, i samma form som fetch_sfdb_candidates (plus originaltitel)."""
+    if title_index is None: return []
+    try:
+        films = title_index.search(title)
+    except Exception as e:
+        logging.error(f"Fel vid sökning i lokalt titelindex: {e}")
+        return []
+    return [{
+        'title_sv': f"{film['title']} ({film['year']})" if film['year'] else film['title'],
+        'url': sfdb_movie_url(film['itemid']),
+        'itemid': film['itemid'],
+        'original_title': film['original_title'],
+    } for film in films]
+
+@STAGE_SECONDS.time(stage="scoring")
+def score_candidate(initial_movie_data, original_title, normalized_input_title, input_year):
+    """Steg 2: Poängsätter en kandidat mot söktiteln. Returnerar dict om den passerar tröskeln, annars None."""
+    movie_title_with_year = initial_movie_data['title_sv']
+    source = "index" if 'original_title' in initial_movie_data else "live"
+    logging.debug("\nBearbetar OT för: '%s'", movie_title_with_year)
+
+    normalized_swedish_title = normalize_title(movie_title_with_year)
+    swedish_score = title_score(normalized_input_title, normalized_swedish_title)
+    logging.debug("  Score (SV): %s ('%s')", swedish_score, normalized_swedish_title)
+
+    original_score = 0
+    if original_title:
+        normalized_original_title = normalize_title(original_title)
+        original_score = title_score(normalized_input_title, normalized_original_title)
+        logging.debug("  Score (OT): %s ('%s' from '%s')", original_score, normalized_original_title, original_title)
+    else:
+         logging.debug("  Score (OT): 0 (Ingen originaltitel hittades på SFDb)")
 
-            except Exception as exc:
-                logging.error(f"Fel vid bearbetning av OT-resultat för {initial_movie_data.get('url', 'Okänd URL')}: {exc}")
+    score = max(swedish_score, original_score)
+    logging.debug("  >> Max Score: %s", score)
 
-    logging.info(f"Hittade {len(processed_movies)} filmer som passerade tröskeln.")
-    if not processed_movies: return []
+    found_year, year_diff = candidate_year(movie_title_with_year, input_year)
+    logging.debug("  År: %s, Årsdiff: %s", found_year, year_diff)
 
-    # --- Steg 3: Hämta IMDb-poster (parallellt) för de som passerade tröskeln ---
-    with ThreadPoolExecutor(max_workers=3) as executor_poster: # Färre trådar för IMDb
-        future_to_poster = {}
-        for itemid, movie_data in processed_movies.items():
-            title_for_imdb = movie_data['original_title'] if movie_data['original_title'] else movie_data['title']
-            future = executor_poster.submit(get_imdb_poster, title_for_imdb, movie_data['year'])
-            future_to_poster[future] = itemid
+    if score < SCORE_THRESHOLD:
+        logging.debug("    >> IGNORERAD (%s < %s)", score, SCORE_THRESHOLD)
+        CANDIDATES_TOTAL.inc(source=source, outcome="rejected")
+        return None
+    logging.debug("    >> PASSERADE TRÖSKEL (%s >= %s)", score, SCORE_THRESHOLD)
+    CANDIDATES_TOTAL.inc(source=source, outcome="passed")
+    return {
+        "title": movie_title_with_year,
+        "year": found_year,
+        "url": initial_movie_data['url'],
+        "itemid": initial_movie_data['itemid'],
+        "original_title": original_title, # Spara originaltitel för IMDb-sökning
+        "score": score,
+        "year_diff": year_diff
+    }
 
-        for future in as_completed(future_to_poster):
-            itemid = future_to_poster[future]
-            movie_data = processed_movies[itemid] # Hämta tillbaka sparad data
-            try:
-                poster_url = future.result() # Hämta poster från IMDb
-                movie_data['poster_url'] = poster_url # Lägg till postern
-                possible_matches.append(movie_data) # Lägg till i slutliga listan
-            except Exception as exc:
-                logging.error(f"Fel vid hämtning av IMDb-poster för {itemid}: {exc}")
-                # Lägg till ändå men utan poster?
-                movie_data['poster_url'] = None
-                possible_matches.append(movie_data)
+def candidate_year(movie_title_with_year, input_year):
+    """År ur en titel på formen 'Titel (1953)' och avståndet till sökt år (inf om något saknas)."""
+    found_year = None
+    year_match = re.search(r'\((\d{4})\)$', movie_title_with_year.strip())
+    if year_match: found_year = int(year_match.group(1))
 
+    year_diff = float('inf')
+    if input_year and found_year: year_diff = abs(input_year - found_year)
+    return found_year, year_diff
 
-    # Sortera resultaten baserat på data vi redan har
+def match_sort_key(score, year_diff, input_year):
+    """Sorteringsnyckel: exakt år först, sedan närmast år, sedan högst score."""
     if input_year:
-        possible_matches.sort(key=lambda x: (x["year_diff"] != 0, x["year_diff"], -x["score"]))
-    else:
-        possible_matches.sort(key=lambda x: -x["score"])
+        return (year_diff != 0, year_diff, -score)
+    return (-score,)
+
+def sort_matches(matches, input_year):
+    """Sorterar träffar: exakt år först, sedan närmast år, sedan högst score."""
+    matches.sort(key=lambda x: match_sort_key(x["score"], x["year_diff"], input_year))
+    return matches
+
+async def _run_blocking(func, *args):
+    """Kör en blockerande funktion i den delade skrapningspoolen (med requestens deadline)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(scrape_executor, deadline.bind(func), *args)
+
+class SearchResult(list):
+    """Rankade träffar. `degraded` är True om resultatet kan vara ofullständigt eftersom
+    ett uppströmsanrop misslyckades eller tidsbudgeten tog slut; det ska då inte cachas."""
+
+    def __init__(self, matches=(), degraded=False):
+        super().__init__(matches)
+        self.degraded = degraded
 
+async def _score_with_original_title(initial_movie_data, normalized_input_title, input_year, ot_semaphore, result):
+    """Hämtar kandidatens originaltitel och poängsätter den. None om den inte passerar tröskeln.
+
+    Misslyckas hämtningen poängsätts kandidaten utan originaltitel och `result` markeras som degraderat.
+    """
+    try:
+        if 'original_title' in initial_movie_data:
+            # Kandidat från det lokala indexet: originaltiteln är redan känd
+            original_title = initial_movie_data['original_title']
+        else:
+            async with ot_semaphore:
+                try:
+                    original_title = await _run_blocking(get_sfdb_original_title, initial_movie_data['url'])
+                except requests.exceptions.RequestException:
+                    original_title = None
+                    result.degraded = True
+        return score_candidate(initial_movie_data, original_title, normalized_input_title, input_year)
+    except Exception as exc:
+        logging.error(f"Fel vid bearbetning av OT-resultat för {initial_movie_data.get('url', 'Okänd URL')}: {exc}")
+        return None
+
+async def _rank_live_candidates(initial_results, normalized_input_title, input_year, ot_semaphore, result):
+    """Hämtar originaltitel bara för kandidater som fortfarande kan nå topp MAX_RESULTS.
+
+    Varje kandidat poängsätts först på svensk titel och år från träfflistan. Eftersom
+    originaltiteln bara kan höja poängen ger det en pessimistisk nyckel (säkra
+    kandidater) och en optimistisk nyckel (score 100). Hämtningar sker bäst-först och
+    kandidater vars optimistiska nyckel ligger efter den k:e säkra nyckeln hoppas
+    över; indexet i nyckeln gör att resultatet blir detsamma som vid full hämtning.
+    """
+    pruner = TopKPruner(MAX_RESULTS, budget=OT_FETCH_BUDGET)
+    for i, movie in enumerate(initial_results):
+        swedish_score = title_score(normalized_input_title, normalize_title(movie['title_sv']))
+        _, year_diff = candidate_year(movie['title_sv'], input_year)
+        pessimistic_key = match_sort_key(swedish_score, year_diff, input_year) + (i,) if swedish_score >= SCORE_THRESHOLD else None
+        pruner.add(i, match_sort_key(100, year_diff, input_year) + (i,), pessimistic_key)
+
+    results = [None] * len(initial_results)
+    in_flight = {}
+    while True:
+        # När tidsbudgeten är slut startas inga nya hämtningar; resten poängsätts utan originaltitel
+        for i in pruner.take(0 if deadline.expired() else OT_CONCURRENCY - len(in_flight)):
+            task = asyncio.ensure_future(_score_with_original_title(initial_results[i], normalized_input_title, input_year, ot_semaphore, result))
+            in_flight[task] = i
+        if not in_flight: break
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            i = in_flight.pop(task)
+            movie_data = results[i] = task.result()
+            pruner.settle(i, match_sort_key(movie_data['score'], movie_data['year_diff'], input_year) + (i,) if movie_data else None)
+
+    # Budgeten (hämtningar eller tid) slut: resterande kandidater poängsätts utan originaltitel
+    skipped = pruner.unfetched()
+    for i in skipped:
+        results[i] = score_candidate(initial_results[i], None, normalized_input_title, input_year)
+    if skipped and pruner.fetched < OT_FETCH_BUDGET and deadline.expired():
+        result.degraded = True # Hoppades över för att tiden tog slut, inte för att hämtningsbudgeten gjorde det
+    if pruner.pruned:
+        CANDIDATES_TOTAL.inc(len(pruner.pruned), source="live", outcome="pruned")
+    logging.info(f"Hämtade originaltitel för {pruner.fetched} av {len(initial_results)} kandidater "
+                 f"({len(pruner.pruned)} kan inte nå topp {MAX_RESULTS}, {len(skipped)} utanför budget).")
+    return [movie_data for movie_data in results if movie_data is not None]
+
+def request_poster(movie_data):
+    """Köar posteruppslag för en träff i bakgrunden och returnerar en Future med URL:en."""
+    title_for_imdb = movie_data['original_title'] if movie_data['original_title'] else movie_data['title']
+    return poster_resolver.request(movie_data['itemid'], title_for_imdb, movie_data['year'])
+
+def queue_posters(matches):
+    """Sätter redan kända postrar på träffarna och köar uppslag för resten; väntar aldrig på IMDb."""
+    for movie_data in matches:
+        hit, poster_url = poster_resolver.lookup(movie_data['itemid'])
+        movie_data['poster_url'] = poster_url
+        if not hit:
+            request_poster(movie_data)
+    return matches
+
+def _await_shared_future(future):
+    """Som asyncio.wrap_future, men om väntan avbryts lämnas den delade Futuren orörd
+    (andra requests kan vänta på samma posteruppslag)."""
+    loop = asyncio.get_running_loop()
+    waiter = loop.create_future()
+
+    def settle(done):
+        if waiter.done(): return
+        if done.cancelled(): waiter.cancel()
+        elif done.exception() is not None: waiter.set_exception(done.exception())
+        else: waiter.set_result(done.result())
+
+    def on_done(done):
+        try:
+            loop.call_soon_threadsafe(settle, done)
+        except RuntimeError:
+            pass # Loopen är redan stängd; ingen väntar längre
+    future.add_done_callback(on_done)
+    return waiter
+
+async def _attach_poster(movie_data):
+    """Väntar (utan att blockera en tråd) på bakgrundsuppslaget av en träffs poster."""
+    try:
+        movie_data['poster_url'] = await _await_shared_future(request_poster(movie_data))
+    except Exception as exc:
+        logging.error(f"Fel vid hämtning av IMDb-poster för {movie_data['itemid']}: {exc}")
+        movie_data['poster_url'] = None
+    return movie_data
+
+async def rank_candidates_async(title, year=None):
+    """Hämtar SFDb-kandidater, hämtar originaltitel för de som kan nå topplistan och
+    returnerar de bästa träffarna sorterade (utan poster) som ett SearchResult."""
+    normalized_input_title = normalize_title(title)
+    input_year = None
+    if year and year.isdigit(): input_year = int(year)
+
+    logging.info(f"Startar HTML-skrapning för: '{title}', År: {year}")
+    logging.debug("Normaliserad input: '%s'", normalized_input_title)
+
+    ot_semaphore = asyncio.Semaphore(OT_CONCURRENCY)
+    result = SearchResult()
+    possible_matches = []
+
+    # --- Steg 0: Kandidater ur det lokala titelindexet (om det finns) ---
+    index_candidates = find_index_candidates(title)
+    if index_candidates:
+        # Batchpoäng över hela kandidatlistan; bara de som kan nå tröskeln poängsätts i detalj
+        sv_scores = score_titles(normalized_input_title, [movie['title_sv'] for movie in index_candidates], score_cutoff=SCORE_THRESHOLD)
+        ot_scores = score_titles(normalized_input_title, [movie['original_title'] or "" for movie in index_candidates], score_cutoff=SCORE_THRESHOLD)
+        prefiltered = [movie for movie, sv_score, ot_score in zip(index_candidates, sv_scores, ot_scores) if max(sv_score, ot_score) >= SCORE_THRESHOLD]
+        if len(prefiltered) < len(index_candidates):
+            CANDIDATES_TOTAL.inc(len(index_candidates) - len(prefiltered), source="index", outcome="rejected")
+        index_candidates = prefiltered
+        results = await asyncio.gather(*(
+            _score_with_original_title(movie, normalized_input_title, input_year, ot_semaphore, result)
+            for movie in index_candidates
+        ))
+        possible_matches = [movie_data for movie_data in results if movie_data is not None]
+        if possible_matches:
+            logging.info(f"Lokalt index gav {len(possible_matches)} träffar, hoppar över SFDb-sökningen.")
+
+    if not possible_matches:
+        # --- Steg 1: Hämta kandidater från SFDb HTML ---
+        try:
+            initial_results = await _run_blocking(fetch_sfdb_candidates, title)
+        except requests.exceptions.RequestException:
+            result.degraded = True
+            return result
+        if not initial_results: return result
+
+        # --- Steg 2: OT och score för kandidater som kan nå topp MAX_RESULTS ---
+        possible_matches = await _rank_live_candidates(initial_results, normalized_input_title, input_year, ot_semaphore, result)
+    logging.info(f"Hittade {len(possible_matches)} filmer som passerade tröskeln.")
+
+    # Sortera resultaten baserat på data vi redan har
+    sort_matches(possible_matches, input_year)
     logging.info(f"Hittade {len(possible_matches)} slutliga matchningar för '{title}'.")
 
     # Returnera topp 6 resultat
-    return possible_matches[:6]
+    result.extend(possible_matches[:MAX_RESULTS])
+    if result.degraded:
+        logging.warning(f"Sökresultatet för '{title}' är ofullständigt (uppströmsfel eller slut på tidsbudget).")
+    return result
+
+async def search_movie_async(title, year=None):
+    """Asynkron sökning. Postrar slås upp i bakgrunden och visas via /poster/<itemid>."""
+    matches = await rank_candidates_async(title, year)
+    # --- Steg 3: Köa IMDb-postrar för de träffar som visas ---
+    return queue_posters(matches)
+
+# Samtidiga sökningar på samma (normaliserade titel, år) delar på en körning
+search_flight = SingleFlight()
 
-# --- check_dcp_availability (Oförändrad) ---
-def check_dcp_availability(movie_url):
-    """Kontrollerar om 'DCP' nämns på filmens SFDb-sida."""
-    # ... (samma kod som i förra svaret) ...
+def search_movie(title, year=None):
+    """Söker via HTML-skrapning; IMDb-postrar köas i bakgrunden (synkron ingång för Flask-routes)."""
+    flight_key = (normalize_title(title), (year or "").strip())
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(movie_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        page_text = soup.get_text(separator=" ", strip=True).upper()
-        if re.search(r'\bDCP\b', page_text):
-             logging.info(f"DCP hittades på {movie_url}")
-             return True
-        else:
-             dist_heading = soup.find('h2', id='companies') # Eller annan relevant ID/klass
-             if dist_heading:
-                 foldout_div = dist_heading.find_next_sibling('div', class_='accordion__foldout')
-                 if foldout_div:
-                     info_table = foldout_div.select_one('table.information-table')
-                     if info_table:
-                         rows = info_table.find_all('tr')
-                         for row in rows:
-                              th = row.find('th')
-                              td = row.find('td')
-                              if th and 'DCP' in th.get_text(strip=True).upper():
-                                   logging.info(f"DCP hittades via specifik distributions-rad på {movie_url}")
-                                   return True
-                              if td and 'DCP' in td.get_text(strip=True).upper():
-                                   logging.info(f"DCP hittades i distributions-td på {movie_url}")
-                                   return True
-             possible_sections = soup.select('div.technical-data, div.distribution-info, dl.attributes dt, dl.attributes dd')
-             for section in possible_sections:
-                 section_text = section.get_text(separator=" ", strip=True).upper()
-                 if "DCP" in section_text:
-                      logging.info(f"DCP hittades i möjlig teknisk/dist-sektion på {movie_url}")
-                      return True
+        matches = search_flight.do(flight_key, lambda: asyncio.run(search_movie_async(title, year)))
+    except deadline.DeadlineExceeded:
+        # Tidsbudgeten tog slut i väntan på en samtidig identisk sökning: samma utfall som när ledarens tar slut
+        logging.warning(f"Tidsbudgeten tog slut i väntan på sökningen efter '{title}'.")
+        return SearchResult(degraded=True)
+    # Egna kopior per anropare, resultatet delas mellan samtidiga requests
+    return SearchResult([dict(movie_data) for movie_data in matches], matches.degraded)
+
+def iter_search_events(title, year=None):
+    """Generator för strömmad sökning.
+
+    Ger först ('matches', rankade träffar) så fort alla kandidater är poängsatta, och
+    därefter ('poster', movie_data) för varje träff i den ordning bakgrundsuppslagen
+    blir klara, så länge tidsbudgeten räcker. Rankningen går via search_movie, så
+    samtidiga identiska sökningar delar på en körning även med startsidan och API:t.
+    """
+    matches = search_movie(title, year)
+    yield 'matches', matches
+    if matches:
+        yield from iterate_async_events(_iter_poster_events(matches, title))
+
+async def _iter_poster_events(matches, title):
+    """Asynkron generator: ('poster', movie_data) för varje träff när dess poster är uppslagen."""
+    # Posters hämtas bara för de träffar som faktiskt visas
+    pending = {asyncio.ensure_future(_attach_poster(movie_data)) for movie_data in matches}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=deadline.remaining(), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Uppslagen fortsätter i bakgrunden; sidan hämtar dem via /img/<itemid> senare
+                logging.info("Tidsbudgeten slut, %d postrar strömmas inte för '%s'.", len(pending), title)
+                break
+            for task in done:
+                yield 'poster', task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+def iterate_async_events(async_gen):
+    """Driver en asynkron generator från synkron kod (t.ex. en Flask-strömning) i en egen event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(async_gen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(async_gen.aclose())
+        # Tasks som generatorn lämnat efter sig (t.ex. avbrutna posterväntningar) avslutas innan loopen stängs
+        leftover = asyncio.all_tasks(loop)
+        if leftover:
+            for task in leftover:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*leftover, return_exceptions=True))
+        loop.close()
+
+# --- check_dcp_availability ---
+# Samtidiga strömmade kontroller av samma sida delar på en hämtning
+dcp_flight = SingleFlight()
+# En strömmad kontroll som avbryts när DCP hittats har inte hela sidan att spara i
+# sidcachen; då sparas utfallet i stället, lika länge som sidan hade sparats.
+DCP_FOUND_MAX_ENTRIES = 5000
+_dcp_found = {} # movie_url -> löper ut
+_dcp_found_lock = threading.Lock()
+
+def _dcp_found_cached(movie_url):
+    with _dcp_found_lock:
+        expires_at = _dcp_found.get(movie_url)
+        if expires_at is not None and time.time() >= expires_at:
+            del _dcp_found[movie_url]
+            expires_at = None
+    return expires_at is not None
+
+def _stream_dcp_check(movie_url):
+    """Strömmad DCP-kontroll. Läses hela sidan sparas den i sidcachen, annars bara utfallet."""
+    stored = []
+    def store(response, text):
+        stored.append(page_cache.put(movie_url, text, etag=response.headers.get('ETag'),
+                                     last_modified=response.headers.get('Last-Modified')))
+    found = detect_dcp(http_client.client.get, movie_url, timeout=10, on_complete=store)
+    if found and not stored:
+        now = time.time()
+        with _dcp_found_lock:
+            if len(_dcp_found) >= DCP_FOUND_MAX_ENTRIES:
+                # Släng de poster som går ut först
+                for url in sorted(_dcp_found, key=_dcp_found.get)[:DCP_FOUND_MAX_ENTRIES // 10]:
+                    del _dcp_found[url]
+            _dcp_found[movie_url] = now + page_cache.ttl_for(movie_url)
+    return found
+
+@STAGE_SECONDS.time(stage="dcp_check")
+def check_dcp_availability(movie_url, movie_page=None):
+    """Kontrollerar om 'DCP' nämns på filmens SFDb-sida.
+
+    Om en redan hämtad SfdbMoviePage skickas med (eller sidan finns i sidcachen)
+    återanvänds den; en inaktuell post revalideras med ETag. Finns sidan inte alls
+    i cachen läses den strömmat och bara tills svaret är känt.
+    """
+    try:
+        if movie_page is None:
+            if page_cache.peek(movie_url, stale=True) is None:
+                if _dcp_found_cached(movie_url): return True
+                return dcp_flight.do(movie_url, _stream_dcp_check, movie_url)
+            movie_page = fetch_sfdb_movie_page(movie_url)
+        return movie_page.dcp_available
     except requests.exceptions.RequestException as e:
         logging.error(f"Nätverksfel vid kontroll av DCP för {movie_url}: {e}")
         return False
     except Exception as e:
         logging.error(f"Fel vid parsing/kontroll av DCP för {movie_url}: {e}")
         return False
-    logging.info(f"DCP nämndes INTE på {movie_url}")
-    return False
+
+
+# --- Postrar i bakgrunden ---
+POSTER_DEADLINE_SECONDS = float(os.environ.get("POSTER_DEADLINE_SECONDS", 20)) # Per uppslag i bakgrundstrådarna
+
+@deadline.within(POSTER_DEADLINE_SECONDS)
+def resolve_poster(itemid, title=None, year=None):
+    """Slår upp poster för ett SFDb-itemid. Utan titel läses titel och år från SFDb-sidan (cachad)."""
+    if not title:
+        movie_page = fetch_sfdb_movie_page(sfdb_movie_url(itemid))
+        title = movie_page.original_title or movie_page.title
+        year = movie_page.year
+    if not title: return None
+    return get_imdb_poster(title, year)
+
+poster_resolver = PosterResolver(resolve_poster, workers=POSTER_WORKERS)
+# Hur länge /poster och /img väntar på ett pågående uppslag. Kort, eftersom varje väntan
+# håller en waitress-tråd och uppslagen mot IMDb är strypta till ett par per sekund; är
+# uppslaget inte klart får sidan platshållaren (no-store) och SSE-strömmen fyller i postern.
+POSTER_WAIT_SECONDS = 1
+PLACEHOLDER_POSTER_URL = "https://via.placeholder.com/150x225/111/333?text=Poster+Saknas"
+
+# Skalade postrar serveras från egen disk via /img/<itemid> i stället för att hotlänka IMDb
+THUMB_CACHE_DIR = os.environ.get("THUMB_CACHE_DIR", "thumb_cache")
+THUMB_CACHE_MAX_BYTES = int(os.environ.get("THUMB_CACHE_MAX_MB", 200)) * 1024 * 1024
+THUMB_MAX_AGE = 7 * 24 * 3600 # Samma som posterresolverns TTL
+thumbnail_cache = ThumbnailCache(THUMB_CACHE_DIR, THUMB_CACHE_MAX_BYTES, fetch=http_client.client.get)
+
+
+# --- Bevakningslista (omkontroll av DCP-status i bakgrunden) ---
+WATCHLIST_PATH = os.environ.get("WATCHLIST_PATH", "watchlist.sqlite3") # Tom sträng = endast i minnet
+WATCHLIST_REFRESH_SECONDS = int(os.environ.get("WATCHLIST_REFRESH_SECONDS", 6 * 3600)) # 0 = ingen schemaläggning
+# Schemaläggaren startas vid första requesten i webbprocessen, inte vid import. Med flera
+# webbprocesser (t.ex. gunicorn-workers) sätts WATCHLIST_SCHEDULER=0 och omkontrollerna
+# körs i en egen process: `flask --app app watchlist-scheduler`.
+WATCHLIST_SCHEDULER = os.environ.get("WATCHLIST_SCHEDULER", "1") != "0"
+
+def inspect_watchlist_page(movie_url, html):
+    """Titel och DCP-status för en ändrad filmsida; sidcachens kopia är då inaktuell."""
+    page_cache.invalidate(movie_url)
+    movie_page = SfdbMoviePage(movie_url, html)
+    return movie_page.title or movie_page.original_title, check_dcp_availability(movie_url, movie_page=movie_page)
+
+watchlist = Watchlist(
+    WATCHLIST_PATH,
+    fetch=http_client.client.get, # Direkt mot SFDb (villkorligt), inte via sidcachens TTL
+    inspect=inspect_watchlist_page,
+    url_for=sfdb_movie_url,
+    interval=WATCHLIST_REFRESH_SECONDS,
+)
+
+@app.before_request
+def start_watchlist_scheduler():
+    if WATCHLIST_SCHEDULER: watchlist.start()
+
+# --- Mätvärden som läses av vid varje /metrics-skrapning ---
+REGISTRY.gauge("dcp_pool_queue_depth", "Väntande jobb per arbetspool.", ("pool",), callback=lambda: {
+    ("scrape",): scrape_executor._work_queue.qsize(),
+    ("poster",): poster_resolver.queue_depth(),
+})
+REGISTRY.gauge("dcp_page_cache", "Sidcachens räknare (träffar per nivå, missar, lagringar, vräkningar).", ("stat",),
+               callback=lambda: {(name,): value for name, value in page_cache.get_stats().items()})
+
+
+# --- Batchkontroll av programlistor ---
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 4)) # Samtidiga titlar; per-värd-taket sätts av http_client
+
+def check_programme_entry(entry):
+    """Löser upp en rad (itemid eller titel+år) till en SFDb-film och kontrollerar DCP."""
+    if entry['itemid']:
+        if not entry['itemid'].isdigit():
+            return {"itemid": entry['itemid'], "error": "Ogiltigt film-ID."}
+        movie_url = sfdb_movie_url(entry['itemid'])
+        movie_page = fetch_sfdb_movie_page(movie_url)
+        return {
+            "itemid": entry['itemid'],
+            "title": movie_page.title or movie_page.original_title,
+            "year": movie_page.year,
+            "match_confidence": 100, # Angivet itemid, ingen matchning behövs
+            "dcp_available": check_dcp_availability(movie_url, movie_page=movie_page),
+            "url": movie_url,
+        }
+    matches = asyncio.run(rank_candidates_async(entry['title'], entry['year']))
+    if not matches:
+        return {"error": "SFDb svarade inte." if matches.degraded else "Inga matchande filmer hittades."}
+    best_match = matches[0]
+    return {
+        "itemid": best_match['itemid'],
+        "title": best_match['title'],
+        "year": best_match['year'],
+        "match_confidence": best_match['score'],
+        "dcp_available": check_dcp_availability(best_match['url']),
+        "url": best_match['url'],
+    }
 
 
 # --- Flask Routes (Nästan oförändrade, `details` behöver ej hämta poster) ---
 
 @app.route('/', methods=['GET', 'POST'])
+@deadline.within(REQUEST_DEADLINE_SECONDS)
 def index():
     """Hanterar huvudsidan med sökformulär och resultatlista."""
     if request.method == 'POST':
@@ -453,7 +826,7 @@ def index():
         logging.info(f"Mottagen POST-request: Titel='{movie_title}', År='{release_year}'")
         movie_results = search_movie(movie_title, year=release_year) # Anropar nu IMDb-poster versionen
         if not movie_results:
-            error_message = "Inga matchande filmer hittades."
+            error_message = "Kunde inte nå SFDb just nu, försök igen." if movie_results.degraded else "Inga matchande filmer hittades."
             logging.info(f"Inga resultat funna för '{movie_title}'.")
             return render_template('index.html', movies=[], error=error_message, search_title=movie_title, search_year=release_year)
         else:
@@ -463,56 +836,382 @@ def index():
     return render_template('index.html', movies=None, error=None, search_title='', search_year='')
 
 
-@app.route('/details/<itemid>')
-def details(itemid):
-    """Visar detaljer och DCP-status för en specifik film."""
-    # Not: Denna route hämtar INTE poster från IMDb igen.
-    # Postern (eller None) borde ha hämtats i söksteget.
-    # Om vi *vill* visa poster här måste vi antingen:
-    # 1. Skicka med poster_url från index-sidan (via URL-parameter eller session - krångligt)
-    # 2. Göra om IMDb-sökningen/skrapningen här IGEN (långsamt)
-    # Vi väljer att visa detaljsidan UTAN poster för enkelhets skull.
-    logging.info(f"Hämtar detaljer för itemid: {itemid}")
-    if not itemid or not itemid.isdigit():
-        logging.error(f"Ogiltigt itemid mottaget: {itemid}")
-        return render_template('details.html', error="Ogiltigt film-ID.", movie_data=None)
-    movie_url = f"{SFDB_BASE_URL}/sv/item/?type=film&itemid={itemid}"
+def _sse_event(event, data):
+    """Formaterar ett Server-Sent Event med JSON-data."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stream_movie_payload(movie_data):
+    """De fält från en träff som skickas till webbläsaren vid strömning."""
+    return {
+        "itemid": movie_data['itemid'],
+        "title": movie_data['title'],
+        "year": movie_data['year'],
+        "details_url": url_for('details', itemid=movie_data['itemid']),
+        "poster_url": movie_data.get('poster_url'),
+        "image_url": url_for('poster_image', itemid=movie_data['itemid']) if movie_data.get('poster_url') else None,
+    }
+
+@app.route('/search/stream')
+def search_stream():
+    """Strömmar sökresultat som Server-Sent Events: först rankade träffar, sedan en poster i taget."""
+    movie_title = request.args.get('movie_title', '').strip()
+    release_year = request.args.get('release_year', '').strip()
+    if not movie_title:
+        return Response(_sse_event('error', {"error": "Du måste ange en filmtitel."}), mimetype='text/event-stream')
+    logging.info(f"Strömmad sökning: Titel='{movie_title}', År='{release_year}'")
+
+    def generate():
+        with deadline.within(REQUEST_DEADLINE_SECONDS):
+            for event in iter_search_events(movie_title, release_year):
+                if event[0] == 'matches':
+                    matches = event[1]
+                    if not matches:
+                        yield _sse_event('error', {"error": "Kunde inte nå SFDb just nu, försök igen." if matches.degraded
+                                                   else "Inga matchande filmer hittades."})
+                        break
+                    yield _sse_event('matches', [_stream_movie_payload(movie_data) for movie_data in matches])
+                else:
+                    movie_data = event[1]
+                    yield _sse_event('poster', {key: value for key, value in _stream_movie_payload(movie_data).items()
+                                                if key in ('itemid', 'poster_url', 'image_url')})
+        yield _sse_event('done', {})
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'} # Ingen buffring i proxies
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+
+@app.route('/poster/<itemid>')
+def poster(itemid):
+    """Redirect till filmens poster (eller platshållare). Med ?format=json returneras URL:en som JSON."""
+    if not itemid.isdigit():
+        return jsonify({"error": "Ogiltigt film-ID."}), 400
+    hit, poster_url = poster_resolver.lookup(itemid)
+    pending = False
+    if not hit:
+        try:
+            poster_url = poster_resolver.request(itemid).result(timeout=POSTER_WAIT_SECONDS)
+        except FuturesTimeoutError:
+            pending = True
+            poster_url = None
+    if request.args.get('format') == 'json':
+        return jsonify({"itemid": itemid, "poster_url": poster_url, "pending": pending})
+    response = redirect(poster_url or PLACEHOLDER_POSTER_URL)
+    # Kända resultat kan cachas av webbläsaren; pågående eller misslyckade uppslag ska försökas igen
+    retry = pending or (not poster_url and poster_resolver.failed(itemid))
+    response.headers['Cache-Control'] = 'no-store' if retry else 'public, max-age=3600'
+    return response
+
+@app.route('/img/<itemid>')
+def poster_image(itemid):
+    """Filmens poster som tumnagel från diskcachen (?w=150|300, WebP om webbläsaren klarar det).
+
+    Utan Pillow, eller om skalningen misslyckas, blir det en redirect som /poster/<itemid>.
+    """
+    if not itemid.isdigit():
+        return jsonify({"error": "Ogiltigt film-ID."}), 400
+    hit, poster_url = poster_resolver.lookup(itemid)
+    if not hit:
+        try:
+            poster_url = poster_resolver.request(itemid).result(timeout=POSTER_WAIT_SECONDS)
+        except FuturesTimeoutError:
+            response = redirect(PLACEHOLDER_POSTER_URL)
+            response.headers['Cache-Control'] = 'no-store' # Pågående uppslag ska försökas igen
+            return response
+    if not poster_url:
+        response = redirect(PLACEHOLDER_POSTER_URL)
+        response.headers['Cache-Control'] = 'no-store' if poster_resolver.failed(itemid) else 'public, max-age=3600'
+        return response
+    if not thumbnails.PIL_AVAILABLE:
+        return redirect(poster_url)
+
+    width = thumbnails.snap_width(request.args.get('w', thumbnails.THUMB_WIDTHS[0], type=int))
+    fmt = thumbnails.pick_format(request.headers.get('Accept'))
+    try:
+        thumbnail = thumbnail_cache.get(itemid, poster_url, width, fmt)
+    except Exception as e:
+        logging.warning(f"Kunde inte skapa tumnagel för {itemid} från {poster_url}: {e}")
+        return redirect(poster_url)
+    response = send_file(thumbnail.path, mimetype=thumbnail.mimetype, etag=thumbnail.etag,
+                         max_age=THUMB_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.vary.add('Accept') # WebP eller JPEG beroende på webbläsare
+    return response
+
+
+def get_movie_details(itemid):
+    """Titel, DCP-status och (redan känd) poster för ett SFDb-itemid; gemensamt för HTML och API.
+
+    Kastar UPSTREAM_ERRORS om SFDb-sidan inte kunde hämtas, så att ett uppströmsfel
+    inte ser ut som "ingen DCP".
+    """
+    movie_url = sfdb_movie_url(itemid)
 
     movie_title = f"Film (ID: {itemid})"
-    # Försök hämta en bra titel
+    # En hämtning och en parsning av filmsidan räcker för titel, originaltitel och DCP
+    movie_page = fetch_sfdb_movie_page(movie_url, max_age=DETAILS_PAGE_MAX_AGE)
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(movie_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        title_tag = soup.select_one('h1.page-header__heading')
-        if title_tag:
-            year_span = title_tag.find('span', class_='page-header__heading--release')
-            if year_span: year_span.extract()
-            h1_title = title_tag.get_text(strip=True)
-            if h1_title and not h1_title.startswith("Film (ID:"): movie_title = h1_title
-            logging.debug(f"Hittade titel för {itemid}: '{movie_title}'")
+        h1_title = movie_page.title
+        if h1_title:
+            if not h1_title.startswith("Film (ID:"): movie_title = h1_title
+            logging.debug("Hittade titel för %s: '%s'", itemid, movie_title)
         else:
              # Försök med originaltitel som fallback om H1 misslyckas
-             original_title_fallback = get_sfdb_original_title(movie_url)
+             original_title_fallback = movie_page.original_title
              if original_title_fallback:
                  movie_title = original_title_fallback
-                 logging.debug(f"Använder SFDb originaltitel för {itemid}: '{movie_title}'")
+                 logging.debug("Använder SFDb originaltitel för %s: '%s'", itemid, movie_title)
              else:
                  logging.warning(f"Kunde inte hitta h1-titel eller OT på {movie_url}")
     except Exception as e:
-        logging.warning(f"Kunde inte hämta/parsea titel för {itemid} från {movie_url}: {e}")
+        logging.warning(f"Kunde inte parsea titel för {itemid} från {movie_url}: {e}")
 
-    dcp_available = check_dcp_availability(movie_url)
-    movie_data = {
+    dcp_available = check_dcp_availability(movie_url, movie_page=movie_page)
+    return {
         "title": movie_title,
         "url": movie_url,
-        "poster_url": None, # Vi hämtar inte postern här för att undvika dubbel skrapning
+        "poster_url": poster_resolver.lookup(itemid)[1], # Endast om den redan är känd; annars lataddas den
         "itemid": itemid,
         "dcp_available": dcp_available
     }
+
+def upstream_error_status(error):
+    """504 om uppströmsanropet tog för lång tid (eller tidsbudgeten tog slut), annars 502."""
+    return 504 if isinstance(error, (requests.exceptions.Timeout, urllib3.exceptions.TimeoutError)) else 502
+
+@app.route('/details/<itemid>')
+@deadline.within(REQUEST_DEADLINE_SECONDS)
+def details(itemid):
+    """Visar detaljer och DCP-status för en specifik film."""
+    # Not: Denna route hämtar INTE poster från IMDb. Sidan lataddar postern via
+    # /img/<itemid>, som oftast redan är uppslagen i bakgrunden från söksteget.
+    logging.info(f"Hämtar detaljer för itemid: {itemid}")
+    if not itemid or not itemid.isdigit():
+        logging.error(f"Ogiltigt itemid mottaget: {itemid}")
+        return render_template('details.html', error="Ogiltigt film-ID.", movie_data=None)
+    try:
+        movie_data = get_movie_details(itemid)
+    except UPSTREAM_ERRORS as e:
+        logging.error(f"Kunde inte hämta SFDb-sidan för {itemid}: {e}")
+        return render_template('details.html', error="Kunde inte nå SFDb just nu, försök igen.", movie_data=None), upstream_error_status(e)
     return render_template('details.html', movie_data=movie_data, error=None)
 
+# --- JSON-API (samma logik som HTML-sidorna) ---
+API_SEARCH_MAX_AGE = 300 # Sökresultat ändras sällan; postrar kan tillkomma
+API_DETAILS_MAX_AGE = 60 # DCP-status pollas; 304 via ETag gör omvalideringen billig
+# Högsta ålder på SFDb-sidan bakom /details och /api/details. Kortare än sidcachens TTL för
+# SFDb (6 h) så att en ändrad DCP-status syns; en inaktuell sida revalideras med ETag (304).
+DETAILS_PAGE_MAX_AGE = int(os.environ.get("DETAILS_PAGE_MAX_AGE", 5 * 60))
+
+def _api_response(payload, max_age, status=200):
+    """JSON-svar med deterministisk ETag (hash av kanonisk JSON), Cache-Control och 304-stöd.
+
+    max_age=None ger ett svar som inte får cachas (Cache-Control: no-store, ingen ETag).
+    """
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    response = Response(body, status=status, mimetype='application/json')
+    if max_age is None:
+        response.cache_control.no_store = True
+        return response
+    response.set_etag(hashlib.sha256(body.encode('utf-8')).hexdigest()[:32], weak=True)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+def _api_match(movie_data):
+    """Fälten för en sökträff i API:et."""
+    return {
+        "itemid": movie_data['itemid'],
+        "title": movie_data['title'],
+        "year": movie_data['year'],
+        "original_title": movie_data['original_title'],
+        "score": movie_data['score'],
+        "url": movie_data['url'],
+        "details_url": url_for('api_details', itemid=movie_data['itemid']),
+        "poster_url": movie_data.get('poster_url'),
+        "image_url": url_for('poster_image', itemid=movie_data['itemid']),
+    }
+
+@app.route('/api/search')
+@deadline.within(REQUEST_DEADLINE_SECONDS)
+def api_search():
+    """Sökning som JSON: ?title=...&year=... (samma rankning som startsidan)."""
+    movie_title = request.args.get('title', '').strip()
+    release_year = request.args.get('year', '').strip()
+    if not movie_title:
+        return jsonify({"error": "Parametern 'title' saknas."}), 400
+    if release_year and not release_year.isdigit():
+        return jsonify({"error": "Parametern 'year' måste vara ett årtal."}), 400
+    matches = search_movie(movie_title, year=release_year)
+    payload = {"query": {"title": movie_title, "year": int(release_year) if release_year else None},
+               "matches": [_api_match(movie_data) for movie_data in matches]}
+    if matches.degraded:
+        # Ofullständigt resultat (uppströmsfel/tidsbudget): får inte cachas, och utan träffar är det ett fel
+        payload["degraded"] = True
+        if not matches:
+            payload["error"] = "SFDb svarade inte i tid."
+            return _api_response(payload, None, status=504)
+        return _api_response(payload, None)
+    return _api_response(payload, API_SEARCH_MAX_AGE)
+
+@app.route('/api/details/<itemid>')
+@deadline.within(REQUEST_DEADLINE_SECONDS)
+def api_details(itemid):
+    """Titel och DCP-status för en film som JSON; billig att polla med If-None-Match."""
+    if not itemid.isdigit():
+        return jsonify({"error": "Ogiltigt film-ID."}), 400
+    try:
+        movie_data = get_movie_details(itemid)
+    except UPSTREAM_ERRORS as e:
+        logging.error(f"Kunde inte hämta SFDb-sidan för {itemid}: {e}")
+        return _api_response({"itemid": itemid, "error": "SFDb svarade inte."}, None, status=upstream_error_status(e))
+    movie_data["image_url"] = url_for('poster_image', itemid=itemid)
+    # Svaret får inte cachas längre än SFDb-sidan bakom det är färsk
+    cached = page_cache.peek(movie_data["url"], max_age=DETAILS_PAGE_MAX_AGE)
+    fresh_for = int(page_cache.fresh_for(cached, DETAILS_PAGE_MAX_AGE)) if cached is not None else 0
+    return _api_response(movie_data, min(API_DETAILS_MAX_AGE, fresh_for))
+
+@app.after_request
+def compress(response):
+    return compress_response(response, request.accept_encodings)
+
+@app.route('/batch', methods=['POST'])
+def batch_check():
+    """Tar emot en programlista (fil 'programme' eller JSON/CSV i body) och strömmar DCP-status per titel."""
+    upload = request.files.get('programme')
+    if upload:
+        content, filename = upload.read(), upload.filename or ""
+    else:
+        content, filename = request.get_data(), ".json" if request.is_json else ""
+    try:
+        entries = parse_programme(content, filename)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Kunde inte läsa programlistan: {e}"}), 400
+    if not entries:
+        return jsonify({"error": "Programlistan innehöll inga titlar."}), 400
+
+    output_format = (request.args.get('format') or request.form.get('format') or 'csv').lower()
+    logging.info(f"Batchkontroll av {len(entries)} titlar ({output_format})")
+    results = run_batch(entries, check_programme_entry, concurrency=BATCH_CONCURRENCY)
+    if output_format == 'json':
+        return Response(stream_with_context(iter_json(results)), mimetype='application/json')
+    headers = {'Content-Disposition': 'attachment; filename="dcp_status.csv"'}
+    return Response(stream_with_context(iter_csv(results)), mimetype='text/csv', headers=headers)
+
+@app.template_filter('datetime')
+def format_timestamp(timestamp):
+    """Unix-tid som lokal tid, t.ex. 2024-05-01 14:30."""
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp)) if timestamp else "-"
+
+def _wants_json():
+    return request.args.get('format') == 'json' or request.is_json
+
+@app.route('/watchlist', methods=['GET', 'POST'])
+def watchlist_view():
+    """Bevakade filmer med förberäknad DCP-status. POST lägger till ett itemid (formulär eller JSON)."""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        itemid = str(data.get('itemid', '')).strip()
+        if not itemid.isdigit():
+            if _wants_json(): return jsonify({"error": "Ogiltigt film-ID."}), 400
+            return render_template('watchlist.html', entries=watchlist.entries(), flips=watchlist.history(flips_only=True, limit=10),
+                                   error="Ogiltigt film-ID."), 400
+        watchlist.add(itemid, title=data.get('title') or None)
+        if _wants_json(): return jsonify(watchlist.get(itemid)), 201
+        return redirect(url_for('watchlist_view'))
+
+    entries = watchlist.entries()
+    flips = watchlist.history(flips_only=True, limit=10)
+    if _wants_json():
+        return jsonify({"entries": entries, "recent_flips": flips, "refresh_seconds": WATCHLIST_REFRESH_SECONDS})
+    return render_template('watchlist.html', entries=entries, flips=flips, error=None)
+
+@app.route('/watchlist/<itemid>', methods=['GET', 'DELETE'])
+def watchlist_entry(itemid):
+    """Status och historik för en bevakad film, eller DELETE för att sluta bevaka den."""
+    if request.method == 'DELETE':
+        if not watchlist.remove(itemid): return jsonify({"error": "Filmen bevakas inte."}), 404
+        return '', 204
+    entry = watchlist.get(itemid)
+    if entry is None: return jsonify({"error": "Filmen bevakas inte."}), 404
+    entry["history"] = watchlist.history(itemid=itemid)
+    return jsonify(entry)
+
+@app.route('/watchlist/<itemid>/remove', methods=['POST'])
+def watchlist_remove(itemid):
+    """Formulärvariant av DELETE /watchlist/<itemid>."""
+    watchlist.remove(itemid)
+    return redirect(url_for('watchlist_view'))
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Träff/miss-räknare för sidcachen, hastighetsbegränsaren och single-flight."""
+    stats = page_cache.get_stats()
+    stats["rate_limiter"] = http_client.client.rate_limiter.get_stats()
+    stats["singleflight"] = {"pages": page_cache.flight.get_stats(), "searches": search_flight.get_stats()}
+    return jsonify(stats)
+
+@app.route('/metrics')
+def metrics():
+    """Latens, parsningstid, kandidatutfall och kölängder i Prometheus textformat."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+# --- CLI ---
+
+@app.cli.command('build-index')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--index', 'index_path', default=None, help='Sökväg till indexfilen (standard: SFDB_INDEX_PATH).')
+def build_index_command(directory, index_path):
+    """Bygger det lokala titelindexet från sparade SFDb-filmsidor i DIRECTORY."""
+    index = TitleIndex(index_path or SFDB_INDEX_PATH, normalize_title)
+    started = time.perf_counter()
+    count = index.build_from_directory(directory)
+    click.echo(f"Indexerade {count} filmer ({len(index)} totalt) på {time.perf_counter() - started:.1f}s -> {index.path}")
+    index.close()
+
+@app.cli.command('import-imdb')
+@click.argument('dump', type=click.Path(exists=True, dir_okay=False))
+@click.option('--index', 'index_path', default=None, help='Bas-sökväg för indexfilerna (standard: IMDB_INDEX_PATH).')
+@click.option('--chunk-size', type=int, default=500_000, show_default=True, help='Poster per sorterad delfil (styr minnesåtgången).')
+def import_imdb_command(dump, index_path, chunk_size):
+    """Bygger det lokala IMDb-indexet från DUMP (title.basics.tsv eller .tsv.gz)."""
+    index_path = index_path or IMDB_INDEX_PATH
+    started = time.perf_counter()
+    stats = import_title_basics(dump, index_path, normalize_title, chunk_size=chunk_size)
+    click.echo(f"Importerade {stats['records']} titelnycklar från {stats['rows']} rader på {time.perf_counter() - started:.1f}s -> {index_path}")
+    click.echo(f"Indexfiler: {stats['keys_bytes'] / 2**20:.1f} MB nycklar + {stats['offsets_bytes'] / 2**20:.1f} MB offsets (mmap, läses vid behov)")
+    try:
+        import resource
+        # ru_maxrss är i KB på Linux
+        click.echo(f"Högsta minnesanvändning (RSS) under importen: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    except ImportError:
+        pass # Finns inte på Windows
+
+@app.cli.command('watchlist-scheduler')
+def watchlist_scheduler_command():
+    """Kör omkontrollerna av bevakade filmer i förgrunden (en process för hela driftsättningen)."""
+    if WATCHLIST_REFRESH_SECONDS <= 0:
+        raise click.ClickException("WATCHLIST_REFRESH_SECONDS är 0; schemaläggningen är avstängd.")
+    click.echo(f"Kontrollerar bevakade filmer var {WATCHLIST_REFRESH_SECONDS}s (Ctrl-C avslutar).")
+    watchlist.run()
+
+@app.cli.command('dcp-batch')
+@click.argument('programme', type=click.File('rb'))
+@click.option('--format', 'output_format', type=click.Choice(['csv', 'json']), default='csv')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Resultatfil (standard: stdout).')
+@click.option('--concurrency', type=int, default=BATCH_CONCURRENCY, show_default=True)
+def dcp_batch_command(programme, output_format, output, concurrency):
+    """Kontrollerar DCP-status för alla titlar i PROGRAMME (CSV eller JSON)."""
+    try:
+        entries = parse_programme(programme.read(), programme.name or "")
+    except (ValueError, UnicodeDecodeError) as e:
+        raise click.ClickException(f"Kunde inte läsa programlistan: {e}")
+    timer = BatchTimer()
+    results = timer.track(run_batch(entries, check_programme_entry, concurrency=concurrency))
+    for chunk in (iter_json if output_format == 'json' else iter_csv)(results):
+        output.write(chunk)
+        output.flush()
+    click.echo(f"{timer.count} titlar på {timer.elapsed:.1f}s ({timer.titles_per_minute:.1f} titlar/minut)", err=True)
+
 # --- App Execution ---
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+# --- Batchkontroll av DCP för en hel programlista ---
+# Läser en lista med titel+år eller itemid (CSV eller JSON), kör kontrollen för
+# varje rad med begränsad samtidighet och strömmar tillbaka en resultattabell i
+# samma ordning som indata.
+
+import csv
+import io
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RESULT_COLUMNS = ["input_title", "input_year", "itemid", "title", "year", "match_confidence", "dcp_available", "url", "error"]
+
+_TITLE_KEYS = ("title", "titel", "movie_title")
+_YEAR_KEYS = ("year", "år", "ar", "release_year")
+_ITEMID_KEYS = ("itemid", "item_id", "id")
+
+
+def _first_value(row, keys):
+    for key in keys:
+        value = row.get(key)
+        if value not in (None, ""):
+            return str(value).strip()
+    return ""
+
+
+def _normalize_row(row):
+    row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+    return {
+        "title": _first_value(row, _TITLE_KEYS),
+        "year": _first_value(row, _YEAR_KEYS),
+        "itemid": _first_value(row, _ITEMID_KEYS),
+    }
+
+
+def parse_programme(content, filename=""):
+    """Tolkar en programlista. JSON: lista av objekt eller {"titles": [...]}; annars CSV med rubrikrad.
+
+    Rader får ha titel (+ valfritt år) eller itemid. Tomma rader hoppas över.
+    Kastar ValueError om innehållet inte går att tolka som en programlista.
+    """
+    text = content.decode('utf-8-sig') if isinstance(content, bytes) else content
+    stripped = text.lstrip()
+    if filename.lower().endswith('.json') or stripped.startswith(('[', '{')):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get("titles") or data.get("items") or []
+        if not isinstance(data, list):
+            raise ValueError("JSON-programlistan ska vara en lista, eller ett objekt med listan i \"titles\".")
+        for item in data:
+            if not isinstance(item, (str, dict)):
+                raise ValueError(f"Ogiltig rad i JSON-programlistan: {item!r} (ska vara en titel eller ett objekt).")
+        rows = [item if isinstance(item, dict) else {"title": item} for item in data]
+    else:
+        try:
+            dialect = csv.Sniffer().sniff(text[:2048], delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel # T.ex. en enda kolumn utan avgränsare
+        rows = list(csv.DictReader(io.StringIO(text), dialect=dialect))
+    entries = [_normalize_row(row) for row in rows]
+    return [entry for entry in entries if entry["title"] or entry["itemid"]]
+
+
+def run_batch(entries, check_entry, concurrency=4):
+    """Kör check_entry(entry) för alla rader med högst `concurrency` samtidiga kontroller.
+
+    Resultaten ges i indataordning så fort de blir klara. Fel i en rad blir en
+    resultatrad med 'error' i stället för att avbryta hela batchen.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch")
+    try:
+        futures = [executor.submit(check_entry, entry) for entry in entries]
+        for entry, future in zip(entries, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Batchkontroll misslyckades för {entry}: {e}")
+                result = {"error": str(e)}
+            result.setdefault("input_title", entry["title"])
+            result.setdefault("input_year", entry["year"])
+            yield result
+    finally:
+        # Stängs generatorn i förtid (klienten kopplade ner, Ctrl-C i CLI:t) ska köade rader
+        # inte köras klart för ingen; bara de som redan pågår får avslutas i bakgrunden.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_csv(results, columns=RESULT_COLUMNS):
+    """Strömmar resultat som CSV, en rad i taget (rubrikrad först)."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    for result in results:
+        writer.writerow(result)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+def iter_json(results, columns=RESULT_COLUMNS):
+    """Strömmar resultat som en JSON-lista, ett objekt i taget."""
+    yield "["
+    for position, result in enumerate(results):
+        yield ("," if position else "") + json.dumps({column: result.get(column) for column in columns}, ensure_ascii=False)
+    yield "]\n"
+
+
+class BatchTimer:
+    """Räknar titlar per minut för en batchkörning."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+
+    def track(self, results):
+        for result in results:
+            self.count += 1
+            yield result
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def titles_per_minute(self):
+        return self.count / self.elapsed * 60 if self.elapsed > 0 else 0.0
@@ -0,0 +1,86 @@
+"""Mikrobenchmark: poängsättning av en söktitel mot en stor kandidatlista.
+
+Jämför det gamla flödet (normalize_title utan cache + fuzzywuzzy par för par)
+med scoring-modulen (memoiserad normalisering + RapidFuzz batch med score_cutoff).
+
+    python bench/bench_scoring.py [--candidates 20000] [--queries 20]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import scoring # noqa: E402
+
+WORDS = ["sommar", "natt", "det", "sjunde", "inseglet", "smultronstället", "fanny", "och", "alexander",
+         "persona", "tystnaden", "viskningar", "rop", "fucking", "åmål", "tillsammans", "lilja", "4ever",
+         "sällskapsresan", "jönssonligan", "mitt", "liv", "som", "hund", "ronja", "rövardotter", "the",
+         "love", "show", "me", "square", "triangle", "sadness", "force", "majeure", "en", "man", "ove"]
+
+
+def old_normalize_title(title):
+    # Kopia av den ursprungliga normaliseringen (ingen cache, mönster kompileras per anrop)
+    if not title: return ""
+    title_no_year = re.sub(r'\s*\(\d{4}\)$', '', title).strip()
+    title_no_year = title_no_year.replace(':', '').replace('[', '').replace(']', '')
+    title = unicodedata.normalize('NFKD', title_no_year).encode('ascii', 'ignore').decode('utf-8')
+    title = re.sub(r'[^a-zA-Z0-9\s]', '', title)
+    return title.lower().strip()
+
+
+def make_catalogue(size, rng):
+    return [f"{' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).capitalize()} ({rng.randint(1920, 2025)})"
+            for _ in range(size)]
+
+
+def bench_old(queries, catalogue, threshold):
+    try:
+        from fuzzywuzzy import fuzz as old_fuzz
+    except ImportError:
+        return None
+    started = time.perf_counter()
+    for query in queries:
+        normalized_query = old_normalize_title(query)
+        [title for title in catalogue if old_fuzz.token_set_ratio(normalized_query, old_normalize_title(title)) >= threshold]
+    return time.perf_counter() - started
+
+
+def bench_new(queries, catalogue, threshold):
+    scoring.normalize_title.cache_clear()
+    started = time.perf_counter()
+    for query in queries:
+        scoring.best_matches(scoring.normalize_title(query), catalogue, score_cutoff=threshold, limit=None)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--threshold", type=int, default=65)
+    args = parser.parse_args()
+
+    rng = random.Random(1234)
+    catalogue = make_catalogue(args.candidates, rng)
+    queries = [rng.choice(catalogue) for _ in range(args.queries)]
+
+    new_seconds = bench_new(queries, catalogue, args.threshold)
+    old_seconds = bench_old(queries, catalogue, args.threshold)
+    pairs = args.candidates * args.queries
+    print(f"{args.queries} sökningar x {args.candidates} kandidater ({pairs} par)")
+    print(f"  scoring (RapidFuzz batch): {new_seconds:.3f}s ({pairs / new_seconds:,.0f} par/s)")
+    if old_seconds is None:
+        print("  fuzzywuzzy saknas, hoppar över jämförelsen")
+    else:
+        print(f"  gammalt (fuzzywuzzy):      {old_seconds:.3f}s ({pairs / old_seconds:,.0f} par/s)")
+        print(f"  uppsnabbning: {old_seconds / new_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Lokal ersättare för SFDb och IMDb som spelar upp sparade sidor ur bench/fixtures.
+
+Varje svar fördröjs med en konfigurerbar latens plus slumpmässig jitter, så att
+flödena i app.py kan mätas utan att röra de riktiga sajterna.
+
+    python bench/fake_upstream.py --port 8801 --latency 0.08 --jitter 0.04
+
+Sökvägar som stöds:
+    /sv/?s=...                     -> sfdb_search.html
+    /sv/item/?type=film&itemid=N   -> sfdb_film/N.html (404 om den saknas)
+    /find/?q=...                   -> imdb_find.html
+    /title/ttNNN/                  -> imdb_title_ttNNN.html eller imdb_title.html
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class FakeUpstream:
+    """HTTP-server i en bakgrundstråd som svarar med fixture-HTML efter latens + jitter.
+
+    `slow_paths` kan ge extra latens för sökvägar som börjar med ett visst prefix,
+    t.ex. {"/sv/item/": 2.0} för att simulera långsamma SFDb-filmsidor.
+    `tail_fraction` av alla svar (slumpvis) får dessutom `tail_latency` extra, för
+    att simulera en svans av enstaka mycket långsamma svar.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, jitter=0.02, fixtures_dir=FIXTURES_DIR,
+                 slow_paths=None, seed=None, tail_latency=0.0, tail_fraction=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_latency = tail_latency
+        self.tail_fraction = tail_fraction
+        self.fixtures_dir = fixtures_dir
+        self.slow_paths = dict(slow_paths or {})
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for_host(self, hostname):
+        """Bas-URL med ett annat värdnamn (t.ex. 'localhost') så att SFDb och IMDb blir olika värdar."""
+        return f"http://{hostname}:{self.server.server_address[1]}"
+
+    def delay_for(self, path):
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if self.tail_fraction and self.random.random() < self.tail_fraction:
+            delay += self.tail_latency
+        for prefix, extra in self.slow_paths.items():
+            if path.startswith(prefix):
+                delay += extra
+        return delay
+
+    def fixture_for(self, path, query):
+        if path.startswith("/sv/item/"):
+            itemid = (query.get("itemid") or [""])[0]
+            return os.path.join(self.fixtures_dir, "sfdb_film", f"{itemid}.html") if itemid.isdigit() else None
+        if path.startswith("/sv/"):
+            return os.path.join(self.fixtures_dir, "sfdb_search.html")
+        if path.startswith("/find"):
+            return os.path.join(self.fixtures_dir, "imdb_find.html")
+        if path.startswith("/title/"):
+            tconst = path.strip("/").split("/")[1] if path.count("/") >= 2 else ""
+            specific = os.path.join(self.fixtures_dir, f"imdb_title_{tconst}.html")
+            return specific if os.path.exists(specific) else os.path.join(self.fixtures_dir, "imdb_title.html")
+        return None
+
+    def _make_handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, som de riktiga sajterna
+
+            def do_GET(self):
+                with upstream._count_lock:
+                    upstream.request_count += 1
+                parts = urlsplit(self.path)
+                time.sleep(upstream.delay_for(parts.path))
+                fixture = upstream.fixture_for(parts.path, parse_qs(parts.query))
+                if not fixture or not os.path.exists(fixture):
+                    body = b"Not found"
+                    self.send_response(404)
+                else:
+                    with open(fixture, "rb") as f:
+                        body = f.read()
+                    self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                try:
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True # Klienten gav upp (timeout/deadline) medan vi väntade
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-upstream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokal SFDb/IMDb-ersättare för benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8801)
+    parser.add_argument("--latency", type=float, default=0.05, help="Grundlatens per svar i sekunder.")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Max extra slumpmässig latens i sekunder.")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="Extra latens för svansen av långsamma svar.")
+    parser.add_argument("--tail-fraction", type=float, default=0.0, help="Andel svar som får svanslatensen (0-1).")
+    args = parser.parse_args()
+    upstream = FakeUpstream(args.host, args.port, args.latency, args.jitter,
+                            tail_latency=args.tail_latency, tail_fraction=args.tail_fraction)
+    print(f"Fake SFDb/IMDb på {upstream.base_url} (latens {args.latency}s + jitter {args.jitter}s)")
+    print(f"  SFDB_BASE_URL={upstream.base_url} IMDB_BASE_URL={upstream.url_for_host('localhost')}")
+    try:
+        upstream.server.serve_forever()
+    except KeyboardInterrupt:
+        upstream.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Offline-benchmark av sökflödet mot en lokal SFDb/IMDb-ersättare.
+
+Startar bench/fake_upstream.py, pekar appen mot den och mäter p50/p95/p99 per
+steg (SFDb-sökning, originaltitel, IMDb-poster, DCP-kontroll) och för hela
+search_movie och /details, samt genomströmning med samtidiga klienter mot appen
+körd i waitress.
+
+    python bench/run_bench.py --iterations 30 --latency 0.05 --jitter 0.03 --clients 8
+    python bench/run_bench.py --json bench_result.json   # spara för jämförelse över tid
+    python bench/run_bench.py --tail-latency 2 --tail-fraction 0.05 --no-hedge   # svanslatens utan hedge
+
+Som standard är sidcachen avstängd (TTL 0) så att varje mätning går mot
+uppströms; --warm mäter i stället med cachen påslagen.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_upstream import FakeUpstream # noqa: E402
+
+FILM_ITEMIDS = sorted(name[:-5] for name in os.listdir(os.path.join(BENCH_DIR, "fixtures", "sfdb_film")) if name.endswith(".html"))
+QUERIES = [("Sommar", ""), ("Sommaren med Monika", "1953"), ("Sommarnattens leende", ""), ("Det sjunde inseglet", "1957")]
+
+
+def percentile(sorted_values, fraction):
+    """Närmaste-rang-percentil ur en sorterad lista."""
+    if not sorted_values: return float("nan")
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples):
+    values = sorted(samples)
+    return {
+        "n": len(values),
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "max_ms": (values[-1] if values else float("nan")) * 1000,
+    }
+
+
+def timed(samples, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    samples.append(time.perf_counter() - started)
+    return result
+
+
+def start_upstream(args):
+    upstream = FakeUpstream(latency=args.latency, jitter=args.jitter, seed=args.seed,
+                            tail_latency=args.tail_latency, tail_fraction=args.tail_fraction).start()
+    # Olika värdnamn för SFDb och IMDb så att pooler och hastighetsgränser blir per värd som i drift
+    os.environ["SFDB_BASE_URL"] = upstream.url_for_host("127.0.0.1")
+    os.environ["IMDB_BASE_URL"] = upstream.url_for_host("localhost")
+    os.environ["PAGE_CACHE_PATH"] = ""
+    os.environ["SFDB_INDEX_PATH"] = ""
+    os.environ["IMDB_INDEX_PATH"] = ""
+    os.environ["REQUEST_DEADLINE_SECONDS"] = str(args.deadline)
+    os.environ["WATCHLIST_PATH"] = ""
+    os.environ["WATCHLIST_SCHEDULER"] = "0"
+    if args.imdb_index:
+        # Bygg ett IMDb-index av fixture-dumpen, så att posteruppslagen hoppar över IMDb-sökningen
+        from imdb_index import import_title_basics
+        from scoring import normalize_title
+        index_path = os.path.join(tempfile.mkdtemp(prefix="bench_imdb_"), "imdb_index")
+        import_title_basics(os.path.join(BENCH_DIR, "fixtures", "title.basics.sample.tsv"), index_path, normalize_title)
+        os.environ["IMDB_INDEX_PATH"] = index_path
+    return upstream
+
+
+def import_app(args):
+    import app as app_module
+    logging.disable(logging.WARNING) # Mät koden, inte loggningen
+    # Fake-värdarna ska ha samma pool- och hastighetsinställningar som de riktiga
+    import http_client
+    limiter = http_client.client.rate_limiter
+    limiter.host_rates.setdefault(http_client.SFDB_HOST, (8.0, 10))
+    limiter.host_rates.setdefault(http_client.IMDB_HOST, (2.0, 3))
+    if args.no_rate_limit:
+        limiter.host_rates = {host: (1e6, 1e6) for host in (http_client.SFDB_HOST, http_client.IMDB_HOST)}
+    if args.no_hedge:
+        http_client.client.hedge_hosts = set()
+    if not args.warm:
+        app_module.page_cache.default_ttl = 0
+        app_module.page_cache.ttl_by_host = {}
+    return app_module
+
+
+def bench_stages(app_module, args):
+    rng = random.Random(args.seed)
+    stages = {name: [] for name in ("sfdb_search", "ot_fetch", "imdb_poster", "dcp_check", "search_movie", "details")}
+    client = app_module.app.test_client()
+    for _ in range(args.iterations):
+        title, year = rng.choice(QUERIES)
+        itemid = rng.choice(FILM_ITEMIDS)
+        movie_url = app_module.sfdb_movie_url(itemid)
+        timed(stages["sfdb_search"], app_module.fetch_sfdb_candidates, title)
+        original_title = timed(stages["ot_fetch"], app_module.get_sfdb_original_title, movie_url)
+        timed(stages["imdb_poster"], app_module.get_imdb_poster, original_title or title, int(year) if year else None)
+        timed(stages["dcp_check"], app_module.check_dcp_availability, movie_url)
+        timed(stages["search_movie"], app_module.search_movie, title, year)
+        timed(stages["details"], client.get, f"/details/{itemid}")
+    return {name: summarize(samples) for name, samples in stages.items()}
+
+
+def stop_server(server, thread):
+    """Stoppar waitress-loopen innan servern stängs.
+
+    server.close() från en annan tråd stänger socketarna medan loopen väntar i
+    select(), vilket ger "Bad file descriptor". I stället stängs allt från
+    loopens egen tråd via triggern; loopen avslutas när inget finns kvar att vänta på.
+    """
+    def close_all():
+        for channel in list(server._map.values()):
+            channel.close()
+    server.trigger.pull_trigger(close_all)
+    thread.join(timeout=5)
+    server.task_dispatcher.shutdown()
+
+
+def bench_throughput(app_module, args):
+    import requests
+    from waitress import create_server
+
+    server = create_server(app_module.app, host="127.0.0.1", port=0, threads=args.server_threads)
+    thread = threading.Thread(target=server.run, name="waitress-bench", daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.effective_port}"
+    rng = random.Random(args.seed)
+    jobs = [rng.choice(QUERIES) for _ in range(args.requests)]
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def run(job):
+        nonlocal errors
+        title, year = job
+        started = time.perf_counter()
+        try:
+            response = requests.post(base_url + "/", data={"movie_title": title, "release_year": year}, timeout=120)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            if not ok: errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        list(executor.map(run, jobs))
+    elapsed = time.perf_counter() - started
+    stop_server(server, thread)
+    result = summarize(latencies)
+    result.update({"clients": args.clients, "errors": errors, "seconds": elapsed, "requests_per_second": len(jobs) / elapsed})
+    return result
+
+
+def print_table(stages, throughput):
+    print(f"{'steg':<14}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, row in stages.items():
+        print(f"{name:<14}{row['n']:>5}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+    if throughput:
+        print(f"\nGenomströmning: {throughput['requests_per_second']:.2f} sökningar/s med {throughput['clients']} klienter "
+              f"({throughput['n']} st, {throughput['errors']} fel), p50 {throughput['p50_ms']:.0f} ms, "
+              f"p95 {throughput['p95_ms']:.0f} ms, p99 {throughput['p99_ms']:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline-benchmark av sökflödet mot lokal SFDb/IMDb-ersättare.")
+    parser.add_argument("--iterations", type=int, default=20, help="Mätningar per steg.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Uppströmslatens per svar (s).")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Max extra slumpmässig latens (s).")
+    parser.add_argument("--clients", type=int, default=8, help="Samtidiga klienter i genomströmningstestet.")
+    parser.add_argument("--requests", type=int, default=40, help="Antal sökningar i genomströmningstestet (0 = hoppa över).")
+    parser.add_argument("--server-threads", type=int, default=4, help="waitress-trådar (standard som waitress-serve).")
+    parser.add_argument("--warm", action="store_true", help="Mät med sidcachen påslagen.")
+    parser.add_argument("--imdb-index", action="store_true", help="Slå upp IMDb-titlar i ett lokalt index byggt av fixture-dumpen.")
+    parser.add_argument("--no-rate-limit", action="store_true", help="Stäng av hastighetsbegränsningen mot fake-värdarna.")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="Extra latens för svansen av långsamma svar (s).")
+    parser.add_argument("--tail-fraction", type=float, default=0.0, help="Andel uppströmssvar som får svanslatensen (0-1).")
+    parser.add_argument("--deadline", type=float, default=10, help="Tidsbudget per request i sekunder (0 = ingen).")
+    parser.add_argument("--no-hedge", action="store_true", help="Stäng av hedgade SFDb-anrop.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="Skriv resultatet som JSON hit.")
+    args = parser.parse_args()
+
+    upstream = start_upstream(args)
+    app_module = import_app(args)
+    stages = bench_stages(app_module, args)
+    throughput = bench_throughput(app_module, args) if args.requests else None
+    upstream.stop()
+
+    print_table(stages, throughput)
+    print(f"\nUppströmsanrop totalt: {upstream.request_count}")
+    hedge_stats = app_module.http_client.client.hedge_stats
+    print(f"Hedgade SFDb-anrop: {hedge_stats['hedged']} av {hedge_stats['requests']} ({hedge_stats['won']} vann)")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "stages": stages, "throughput": throughput}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
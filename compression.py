@@ -0,0 +1,49 @@
+# --- Komprimering av svar ---
+# gzip (alltid) och brotli (om paketet är installerat) för JSON, HTML och text.
+# Strömmade svar (SSE, batch) och filer (send_file) lämnas orörda, liksom små
+# svar där komprimeringen inte lönar sig.
+
+import gzip
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/html", "text/plain", "text/csv"}
+MIN_SIZE = 500 # Byte; mindre svar skickas okomprimerade
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5 # Snabb nog att köra per svar, klart mindre än gzip för JSON
+
+
+def choose_encoding(accept_encodings):
+    """Bästa kodningen som klienten accepterar (werkzeug MIMEAccept/Accept), eller None."""
+    if BROTLI_AVAILABLE and accept_encodings['br']:
+        return "br"
+    if accept_encodings['gzip']:
+        return "gzip"
+    return None
+
+
+def compress_response(response, accept_encodings):
+    """Komprimerar svaret på plats om det är lämpligt. Returnerar svaret."""
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 304) or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(accept_encodings)
+    data = response.get_data()
+    if encoding is None or len(data) < MIN_SIZE:
+        return response
+    if encoding == "br":
+        compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0) # mtime=0: samma bytes varje gång
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if response.headers.get('ETag', '').startswith('"'):
+        # Starka ETags gäller exakta bytes; markera som svag eftersom kodningen varierar
+        response.headers['ETag'] = 'W/' + response.headers['ETag']
+    return response
@@ -0,0 +1,171 @@
+# --- Strömmande DCP-kontroll ---
+# För DCP-statusen räcker det att veta om ordet "DCP" finns i filmsidans text.
+# Sidan behöver alltså varken laddas ned helt eller bli ett BeautifulSoup-träd.
+# Svaret läses i bitar och matas till en inkrementell tokeniserare
+# (html.parser). Den tittar bara på textnoderna, precis som get_text i
+# SfdbMoviePage.dcp_available. När ordet dyker upp stängs anslutningen och
+# resten av sidan hämtas inte. Hela sidan parsas bara när skanningen inte räcker
+# som svar, t.ex. när "DCP" bara förekommer som en del av ett längre ord.
+#
+# lxml (standardparsern) reparerar felnästlad markup, t.ex. <p><p>, <td> utanför
+# en tabell eller lösa sluttaggar, och slår då ihop textnoder som html.parser ser
+# som separata. Ordet kan då försvinna ("x" + "DCP" blir "xDCP"). Skannern märker
+# sådan markup och då avgör den fullständiga parsningen i stället.
+
+import codecs
+import logging
+import time
+from html.parser import HTMLParser
+
+import deadline
+from metrics import REGISTRY
+from sfdb_page import DCP_WORD_RE, SfdbMoviePage
+
+CHUNK_SIZE = 8 * 1024
+# Är det högst så här mycket kvar av sidan läses resten, så att anslutningen kan återanvändas
+DRAIN_LIMIT = 16 * 1024
+# Elementen vars innehåll inte räknas som sidtext av get_text (kommentarer hoppas alltid över)
+SKIPPED_TAGS = {"script", "style", "template"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+# Start-taggar som implicit stänger ett öppet element med samma namn (<p><p>, <li><li> ...)
+SIBLING_CLOSING_TAGS = {"p", "li", "dt", "dd", "tr", "td", "th", "option"}
+TABLE_PART_TAGS = {"caption", "colgroup", "tbody", "thead", "tfoot", "tr", "td", "th"}
+# Blockelement som implicit stänger ett öppet <p>
+BLOCK_TAGS = {"address", "article", "aside", "blockquote", "details", "div", "dl", "fieldset", "figure", "footer",
+              "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "main", "nav", "ol", "p", "pre", "section",
+              "table", "ul"}
+
+DCP_SCAN_SECONDS = REGISTRY.histogram(
+    "dcp_scan_seconds", "Tid per strömmad DCP-kontroll, per utfall (found/absent/parsed).", ("outcome",))
+DCP_SCAN_BYTES = REGISTRY.counter(
+    "dcp_scan_bytes_total", "Byte som lästs respektive aldrig laddats ned av den strömmande DCP-kontrollen.", ("kind",))
+
+
+class DcpTextScanner(HTMLParser):
+    """Matas med HTML i bitar och letar efter ordet DCP i textnoderna.
+
+    `found` sätts när ordet setts. `maybe` sätts om "DCP" bara förekommer som
+    delsträng, t.ex. i ett längre ord eller uppdelat över taggar. Den
+    fullständiga kontrollen letar även efter sådana delsträngar i vissa
+    sektioner, så då avgör en full parsning. `repaired` sätts om markupen är
+    felnästlad så att en parser måste reparera den; då kan textnoderna skilja
+    sig från skannerns och bara en full parsning ger samma svar.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found = False
+        self.maybe = False
+        self.repaired = False
+        self._open = [] # Öppna element, för att upptäcka felnästling
+        self._skip_depth = 0
+        self._text = [] # Textnoden hittills; html.parser kan leverera den i flera delar
+        self._tail = "" # Slutet av föregående textnod, för delsträngar över taggränser
+
+    def _flush(self):
+        if not self._text: return
+        text = "".join(self._text).strip().upper()
+        self._text = []
+        if self.found or not text: return
+        if DCP_WORD_RE.search(text):
+            self.found = True
+            return
+        if "DCP" in self._tail + text:
+            self.maybe = True
+        self._tail = text[-2:]
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in SKIPPED_TAGS: self._skip_depth += 1
+        if tag in VOID_TAGS: return
+        if ((tag in SIBLING_CLOSING_TAGS and tag in self._open)
+                or (tag in TABLE_PART_TAGS and "table" not in self._open)
+                or (tag in BLOCK_TAGS and "p" in self._open)):
+            self.repaired = True
+        self._open.append(tag)
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in SKIPPED_TAGS and self._skip_depth: self._skip_depth -= 1
+        if tag in VOID_TAGS: return
+        if self._open and self._open[-1] == tag:
+            self._open.pop()
+            return
+        self.repaired = True # Lös eller felnästlad sluttagg
+        if tag in self._open:
+            del self._open[len(self._open) - 1 - self._open[::-1].index(tag):]
+
+    def handle_data(self, data):
+        if not self._skip_depth: self._text.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def _wire_bytes(response):
+    """Byte lästa från nätet hittills (före eventuell gzip-avkodning)."""
+    try:
+        return response.raw.tell()
+    except Exception:
+        return 0
+
+
+def detect_dcp(fetch, url, timeout=10, chunk_size=CHUNK_SIZE, on_complete=None):
+    """True om 'DCP' nämns på sidan, med samma utfall som SfdbMoviePage.dcp_available.
+
+    `fetch(url, timeout=..., stream=True)` ska ge ett requests-svar. Nätverksfel
+    och felstatusar kastas som requests-undantag. Om tidsbudgeten tar slut under
+    läsningen kastas DeadlineExceeded. Har hela sidan lästs anropas
+    `on_complete(response, text)`, t.ex. för att spara den i sidcachen.
+    """
+    started = time.perf_counter()
+    response = fetch(url, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        content_length = response.headers.get('Content-Length')
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        scanner = DcpTextScanner()
+        chunks = [] # Behövs om skanningen inte ger ett säkert svar, och för on_complete
+        complete = True
+        for chunk in response.iter_content(chunk_size):
+            text = decoder.decode(chunk)
+            chunks.append(text)
+            scanner.feed(text)
+            if scanner.found and not scanner.repaired: break
+            if deadline.expired():
+                raise deadline.DeadlineExceeded(f"Tidsbudgeten tog slut under DCP-kontrollen av {url}")
+        else:
+            text = decoder.decode(b"", final=True)
+            chunks.append(text)
+            scanner.feed(text)
+            scanner.close()
+
+        if scanner.found and not scanner.repaired:
+            outcome = "found"
+            left = int(content_length) - _wire_bytes(response) if content_length and content_length.isdigit() else None
+            if left is None or left > DRAIN_LIMIT:
+                complete = False
+                if left: DCP_SCAN_BYTES.inc(left, kind="saved")
+            elif left:
+                chunks.extend(decoder.decode(chunk) for chunk in response.iter_content(chunk_size))
+                chunks.append(decoder.decode(b"", final=True))
+            logging.info(f"DCP hittades på {url} (strömmad kontroll, {_wire_bytes(response)} byte lästa)")
+            result = True
+        elif scanner.maybe or scanner.found:
+            outcome = "parsed"
+            result = SfdbMoviePage(url, "".join(chunks)).dcp_available
+        else:
+            outcome = "absent"
+            logging.info(f"DCP nämndes INTE på {url}")
+            result = False
+        DCP_SCAN_BYTES.inc(_wire_bytes(response), kind="read")
+        if complete and on_complete is not None:
+            on_complete(response, "".join(chunks))
+    finally:
+        response.close() # Ger tillbaka anslutningen om sidan lästs klart, annars stängs den
+    DCP_SCAN_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+    return result
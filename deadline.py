@@ -0,0 +1,85 @@
+# --- Tidsbudget per request ---
+# En deadline sätts per inkommande request (eller bakgrundsjobb) och följer med
+# anropskedjan via en contextvar. Varje uppströmsanrop får sin timeout ur den
+# återstående budgeten i stället för en fast siffra, och när budgeten är slut
+# kastas DeadlineExceeded, som är en requests-Timeout så att befintliga
+# felhanterare (originaltitel, poster, DCP) degraderar som vid ett nätverksfel.
+#
+# Obs: contextvars följer med asyncio-tasks men inte run_in_executor eller egna
+# trådar; använd bind() för sådana anrop.
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+import requests
+
+MIN_TIMEOUT = 0.05 # Sekunder; mindre kvar än så räknas som slut
+
+_current = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Tidsbudgeten för requesten är förbrukad."""
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= MIN_TIMEOUT
+
+    def timeout(self, default):
+        """Timeout för ett anrop: `default`, men aldrig längre än återstående budget."""
+        remaining = self.remaining()
+        if remaining <= MIN_TIMEOUT:
+            raise DeadlineExceeded(f"Tidsbudgeten på {self.seconds:.1f}s är förbrukad")
+        return min(default, remaining) if default is not None else remaining
+
+
+@contextmanager
+def within(seconds):
+    """Sätter en deadline för kodblocket (eller funktionen, som dekorator). En yttre,
+    snävare deadline behålls. seconds=None/0 betyder ingen ny deadline."""
+    outer = _current.get()
+    if not seconds or (outer is not None and outer.remaining() <= seconds):
+        yield outer
+        return
+    token = _current.set(Deadline(seconds))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def current():
+    """Aktuell Deadline, eller None om ingen är satt."""
+    return _current.get()
+
+
+def remaining():
+    """Återstående sekunder, eller None utan deadline (vänta obegränsat)."""
+    active = _current.get()
+    return None if active is None else max(0.0, active.remaining())
+
+
+def expired():
+    active = _current.get()
+    return active is not None and active.expired()
+
+
+def timeout_for(default):
+    """Timeout för ett uppströmsanrop; kastar DeadlineExceeded om budgeten är slut."""
+    active = _current.get()
+    return default if active is None else active.timeout(default)
+
+
+def bind(func):
+    """Binder func till en kopia av aktuell kontext (inklusive deadline), för körning i en annan tråd."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
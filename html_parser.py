@@ -0,0 +1,52 @@
+# --- HTML-parsning ---
+# Väljer snabbaste tillgängliga BeautifulSoup-backend (lxml före html.parser) och
+# låter varje extraktor parsa bara den del av dokumentet den behöver via en
+# SoupStrainer. Alla extraktorer använder fortfarande samma BeautifulSoup-API,
+# så selectors och trädnavigering är oförändrade oavsett backend.
+
+import logging
+import os
+import time
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from metrics import PARSE_SECONDS
+
+try:
+    import lxml # noqa: F401 - används indirekt av BeautifulSoup
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+
+def _select_backend():
+    """Backend från HTML_PARSER (lxml/html.parser), annars lxml om det finns installerat."""
+    requested = os.environ.get("HTML_PARSER", "").strip().lower()
+    if requested == "lxml" and not LXML_AVAILABLE:
+        logging.warning("HTML_PARSER=lxml men lxml är inte installerat, använder html.parser.")
+        return "html.parser"
+    if requested in ("lxml", "html.parser"):
+        return requested
+    return "lxml" if LXML_AVAILABLE else "html.parser"
+
+
+PARSER_BACKEND = _select_backend()
+
+# --- Delparsning per extraktor ---
+# SFDb sökresultat: bara listorna med träffar ('ul.list li.list__item')
+SFDB_SEARCH_RESULTS = SoupStrainer('ul', class_='list')
+# IMDb sökresultat: <main> (nyare layout) och tabeller (äldre '.findResult'-layout)
+IMDB_FIND_RESULTS = SoupStrainer(['main', 'table'])
+# IMDb filmsida: JSON-LD, meta-taggar (og:image) och div-träden där posterbilden ligger
+IMDB_TITLE_POSTER = SoupStrainer(['script', 'meta', 'div'])
+
+
+def parse_html(markup, only=None, backend=None, document="other"):
+    """Parsar markup med vald backend. `only` är en SoupStrainer för delparsning.
+
+    Parsningstiden registreras i dcp_parse_seconds med `document` som etikett.
+    """
+    started = time.perf_counter()
+    soup = BeautifulSoup(markup, backend or PARSER_BACKEND, parse_only=only)
+    PARSE_SECONDS.observe(time.perf_counter() - started, document=document)
+    return soup
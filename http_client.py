@@ -0,0 +1,286 @@
+# --- Delad HTTP-klient ---
+# En requests.Session per uppströmsvärd så att TCP/TLS-anslutningar återanvänds
+# (keep-alive) mellan anrop och mellan samtidiga sökningar. Varje session har en
+# egen anslutningspool med tak och en urllib3-policy för omförsök vid
+# anslutningsfel. Alla anrop går dessutom via en processgemensam
+# hastighetsbegränsare per värd, som också sköter backoff vid 429/5xx.
+# Timeouts hämtas ur requestens tidsbudget (deadline.py), och långsamma
+# SFDb-anrop får en dubblett ("hedge") när de passerat värdens p95.
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+from urllib3.util.retry import Retry
+from urllib3.util.timeout import Timeout
+
+import deadline
+from metrics import UPSTREAM_SECONDS, HEDGED_REQUESTS
+from rate_limit import HostRateLimiter, BACKOFF_STATUSES
+
+# Uppströms bas-URL:er; kan pekas om (t.ex. mot bench/fake_upstream.py) via miljövariabler
+SFDB_BASE_URL = os.environ.get("SFDB_BASE_URL", "https://www.svenskfilmdatabas.se").rstrip('/')
+IMDB_BASE_URL = os.environ.get("IMDB_BASE_URL", "https://www.imdb.com").rstrip('/')
+SFDB_HOST = urlsplit(SFDB_BASE_URL).hostname
+IMDB_HOST = urlsplit(IMDB_BASE_URL).hostname
+
+SFDB_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+IMDB_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)', 'Accept-Language': 'en-US,en;q=0.9'} # Be om engelska
+
+# Max antal samtidiga anslutningar per värd. SFDb dimensioneras efter OT-poolen
+# i search_movie (5 trådar) och IMDb efter posterpoolen (3 trådar), med marginal
+# för att waitress kan köra flera sökningar parallellt.
+HOST_POOL_SIZES = {
+    SFDB_HOST: 10,
+    IMDB_HOST: 6,
+}
+DEFAULT_POOL_SIZE = 4
+
+# (anrop per sekund, burst) per värd. IMDb hålls lågt i stället för den gamla
+# time.sleep(0.5) per posteruppslag.
+HOST_RATE_LIMITS = {
+    SFDB_HOST: (8.0, 10),
+    IMDB_HOST: (2.0, 3),
+}
+STATUS_RETRIES = 2 # Nya försök efter 429/5xx, efter värdens backoff
+
+# Hedgade anrop: om ett anrop mot värden inte svarat inom dess p95 skickas en
+# dubblett och det svar som kommer först används. Endast idempotenta GET mot SFDb.
+HEDGE_HOSTS = {SFDB_HOST} if os.environ.get("HEDGE_REQUESTS", "1") != "0" else set()
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20 # Ingen hedge förrän p95 bygger på tillräckligt många svar
+HEDGE_MIN_DELAY = 0.05 # Sekunder
+HEDGE_MAX_RATIO = 0.1 # Högst var tionde anrop får en dubblett, så att en trög värd inte får dubbel last
+HEDGE_POOL_SIZE = 32
+
+HOST_HEADERS = {
+    SFDB_HOST: SFDB_HEADERS,
+    IMDB_HOST: IMDB_HEADERS,
+}
+
+
+class DeadlineRetry(Retry):
+    """Retry som inte gör nya försök (eller väntar längre) än requestens deadline tillåter."""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if error is not None and deadline.expired():
+            # Rå urllib3-fel (NewConnectionError m.fl.) lindas inte in av requests; kasta ett RequestException
+            raise deadline.DeadlineExceeded(f"Tidsbudgeten tog slut efter {error!r}") from error
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        remaining = deadline.remaining()
+        return backoff if remaining is None else min(backoff, remaining)
+
+
+def build_retry():
+    """Omförsökspolicy för anslutnings-/läsfel (endast GET). Statusbaserade omförsök
+    (429/5xx) sköts av HttpClient via hastighetsbegränsaren så att backoff delas."""
+    return DeadlineRetry(
+        total=3,
+        connect=3,
+        read=2,
+        status=0,
+        backoff_factor=0.5,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False,
+    )
+
+
+class _DeadlinePoolMixin:
+    # Med pool_block väntar urllib3 annars obegränsat på en ledig anslutning
+    def _get_conn(self, timeout=None):
+        return super()._get_conn(timeout=deadline.remaining() if timeout is None else timeout)
+
+    # Anropas för varje försök, även urllib3:s egna omförsök, som annars får hela den ursprungliga timeouten
+    def _get_timeout(self, timeout):
+        timeout = super()._get_timeout(timeout)
+        remaining = deadline.remaining()
+        if remaining is None: return timeout
+        budget = max(remaining, deadline.MIN_TIMEOUT)
+        clip = lambda value: min(value, budget) if isinstance(value, (int, float)) else budget
+        return Timeout(connect=clip(timeout.connect_timeout), read=clip(timeout.read_timeout))
+
+
+class _DeadlineHTTPConnectionPool(_DeadlinePoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _DeadlineHTTPSConnectionPool(_DeadlinePoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class DeadlineAdapter(HTTPAdapter):
+    """HTTPAdapter där väntan på en ledig poolanslutning begränsas av requestens deadline."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _DeadlineHTTPConnectionPool, "https": _DeadlineHTTPSConnectionPool}
+
+
+class LatencyTracker:
+    """Glidande fönster av svarstider för lyckade anrop mot en värd."""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction, min_samples=HEDGE_MIN_SAMPLES):
+        """Percentil ur fönstret, eller None om det har färre än min_samples svar."""
+        with self._lock:
+            if len(self._samples) < min_samples: return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class HttpClient:
+    """Håller en poolad Session per värd och skickar alla GET-anrop via rätt session."""
+
+    def __init__(self, pool_sizes=None, default_pool_size=DEFAULT_POOL_SIZE, host_headers=None, rate_limiter=None,
+                 hedge_hosts=None):
+        self.pool_sizes = dict(pool_sizes or HOST_POOL_SIZES)
+        self.rate_limiter = rate_limiter or HostRateLimiter(HOST_RATE_LIMITS)
+        self.default_pool_size = default_pool_size
+        self.host_headers = dict(host_headers or HOST_HEADERS)
+        self.hedge_hosts = set(HEDGE_HOSTS if hedge_hosts is None else hedge_hosts)
+        self.latency = defaultdict(LatencyTracker) # värd -> svarstider för hedge-tröskeln
+        self.hedge_stats = {"requests": 0, "hedged": 0, "won": 0}
+        self._hedge_executor = None
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _create_session(self, host):
+        pool_size = self.pool_sizes.get(host, self.default_pool_size)
+        adapter = DeadlineAdapter(
+            pool_connections=1, # En pool per värd räcker, sessionen är redan per värd
+            pool_maxsize=pool_size,
+            pool_block=True, # Blockera hellre än att öppna fler anslutningar än taket
+            max_retries=build_retry(),
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(self.host_headers.get(host, SFDB_HEADERS))
+        logging.debug("Skapade HTTP-session för %s (max %d anslutningar)", host, pool_size)
+        return session
+
+    def session_for(self, url):
+        """Returnerar (och skapar vid behov) sessionen för URL:ens värd."""
+        host = urlsplit(url).netloc
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = self._create_session(urlsplit(url).hostname or host)
+                    self._sessions[host] = session
+        return session
+
+    def get(self, url, params=None, headers=None, timeout=10, **kwargs):
+        """GET via värdens poolade session. Extra headers läggs ovanpå standardvärdena.
+
+        Varje försök hämtar först en token för värden; 429/5xx rapporteras till
+        begränsaren och försöks igen efter dess backoff (högst STATUS_RETRIES gånger).
+        `timeout` är ett tak; med en aktiv deadline används högst den återstående
+        budgeten. Latensen per försök registreras i dcp_upstream_request_seconds.
+        """
+        host = urlsplit(url).hostname or ""
+        # Strömmade svar hedgas inte: förlorarens anslutning skulle hållas upptagen tills svaret stängs
+        if host in self.hedge_hosts and not kwargs.get('stream'):
+            return self._hedged_get(host, url, params, headers, timeout, **kwargs)
+        return self._get(host, url, params, headers, timeout, **kwargs)
+
+    def _hedged_executor(self):
+        if self._hedge_executor is None:
+            with self._lock:
+                if self._hedge_executor is None:
+                    self._hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE, thread_name_prefix="hedge")
+        return self._hedge_executor
+
+    def _may_hedge(self):
+        with self._lock:
+            if self.hedge_stats["hedged"] >= HEDGE_MAX_RATIO * self.hedge_stats["requests"]: return False
+            self.hedge_stats["hedged"] += 1
+            return True
+
+    def _hedged_get(self, host, url, params, headers, timeout, **kwargs):
+        """Som _get, men skickar en dubblett om svaret dröjer längre än värdens p95."""
+        delay = self.latency[host].percentile(HEDGE_PERCENTILE)
+        with self._lock:
+            self.hedge_stats["requests"] += 1
+        if delay is None:
+            return self._get(host, url, params, headers, timeout, **kwargs)
+
+        executor = self._hedged_executor()
+        # Trådarna i poolen ser inte anroparens contextvars; bind() tar med deadline
+        primary = executor.submit(deadline.bind(self._get), host, url, params, headers, timeout, **kwargs)
+        try:
+            return primary.result(timeout=max(delay, HEDGE_MIN_DELAY))
+        except FuturesTimeoutError:
+            pass
+        if deadline.expired() or not self._may_hedge():
+            return primary.result()
+
+        HEDGED_REQUESTS.inc(host=host, outcome="fired")
+        hedge = executor.submit(deadline.bind(self._get), host, url, params, headers, timeout, **kwargs)
+        pending, error = {primary, hedge}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        HEDGED_REQUESTS.inc(host=host, outcome="won")
+                        with self._lock:
+                            self.hedge_stats["won"] += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def _get(self, host, url, params, headers, timeout, **kwargs):
+        session = self.session_for(url)
+        for attempt in range(STATUS_RETRIES + 1):
+            self.rate_limiter.acquire(host, max_wait=deadline.remaining())
+            attempt_timeout = deadline.timeout_for(timeout)
+            started = time.perf_counter()
+            try:
+                response = session.get(url, params=params, headers=headers, timeout=attempt_timeout, **kwargs)
+            except EmptyPoolError:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, host=host, status="error")
+                raise deadline.DeadlineExceeded(f"Ingen ledig anslutning mot {host} inom tidsbudgeten")
+            except requests.exceptions.RequestException as e:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, host=host, status="error")
+                # requests lindar in DeadlineRetry:s DeadlineExceeded i ett ConnectionError; packa upp det
+                cause = e.args[0] if e.args else None
+                if isinstance(cause, deadline.DeadlineExceeded): raise cause from e
+                raise
+            elapsed = time.perf_counter() - started
+            UPSTREAM_SECONDS.observe(elapsed, host=host, status=response.status_code)
+            if response.status_code < 400:
+                self.latency[host].record(elapsed)
+            self.rate_limiter.report(host, response.status_code, response.headers.get('Retry-After'))
+            if response.status_code not in BACKOFF_STATUSES or attempt == STATUS_RETRIES:
+                return response
+            response.close()
+        return response
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+client = HttpClient()
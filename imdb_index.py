@@ -0,0 +1,204 @@
+# --- Lokalt IMDb-titelindex ---
+# Importerar IMDb:s datadump title.basics.tsv(.gz) till två filer som läses via
+# mmap: en sorterad nyckelfil med en post per rad ("titel␟år␟typ␟tconst\n") och
+# en offsetfil med postens startposition (uint64) för binärsökning. En uppslagning
+# på (normaliserad titel, år) tar mikrosekunder och ingen minnesallokering utöver
+# de sidor som faktiskt läses, så get_imdb_poster kan hoppa över IMDb:s sökning.
+
+import array
+import bisect
+import gzip
+import heapq
+import mmap
+import os
+import tempfile
+
+from metrics import REGISTRY
+
+# Endast filmliknande titeltyper; lägre rang föredras när samma titel och år finns flera gånger
+TYPE_RANK = {"movie": 0, "tvMovie": 1, "video": 2, "short": 3, "tvSpecial": 4, "tvMiniSeries": 5}
+SEP = "\x1f" # Sorteras före alla tecken i en normaliserad titel
+UNKNOWN_YEAR = "0000"
+CHUNK_SIZE = 500_000 # Poster per sorterad delfil vid import
+
+IMDB_INDEX_LOOKUPS = REGISTRY.counter(
+    "dcp_imdb_index_lookups_total", "Uppslag i det lokala IMDb-indexet per utfall.", ("outcome",))
+
+
+def index_key(normalized_title, year=None):
+    """Nyckelprefix för en normaliserad titel, med år om det anges."""
+    title = " ".join(normalized_title.split())
+    if year is None:
+        return f"{title}{SEP}"
+    return f"{title}{SEP}{int(year):04d}{SEP}"
+
+
+def _open_dump(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="\n")
+    return open(path, "r", encoding="utf-8", newline="\n")
+
+
+def _iter_records(dump_path, normalize, stats):
+    """Nyckelposter (bytes) för varje filmliknande rad i dumpen, en per unik titel (primär/original)."""
+    with _open_dump(dump_path) as f:
+        header = f.readline().rstrip("\n").split("\t")
+        col = {name: i for i, name in enumerate(header)}
+        for line in f:
+            stats["rows"] += 1
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < len(header): continue
+            rank = TYPE_RANK.get(fields[col["titleType"]])
+            if rank is None or fields[col["isAdult"]] == "1": continue
+            start_year = fields[col["startYear"]]
+            year = start_year if start_year.isdigit() else UNKNOWN_YEAR
+            tconst = fields[col["tconst"]]
+            titles = {fields[col["primaryTitle"]], fields[col["originalTitle"]]}
+            for title in titles:
+                normalized = " ".join(normalize(title).split())
+                if not normalized: continue
+                stats["titles"] += 1
+                yield f"{normalized}{SEP}{year}{SEP}{rank}{SEP}{tconst}\n".encode("utf-8")
+
+
+def _write_sorted_chunk(records, directory):
+    records.sort()
+    handle = tempfile.NamedTemporaryFile("wb", dir=directory, suffix=".chunk", delete=False)
+    with handle:
+        handle.writelines(records)
+    return handle.name
+
+
+def import_title_basics(dump_path, index_path, normalize, chunk_size=CHUNK_SIZE):
+    """Bygger index_path.keys och index_path.offsets från en title.basics-dump.
+
+    Sorteringen görs i delfiler om `chunk_size` poster som sedan slås ihop, så
+    minnesåtgången begränsas av chunk_size i stället för dumpens storlek.
+    Returnerar statistik: rader, titlar, poster och filstorlekar.
+    """
+    stats = {"rows": 0, "titles": 0, "records": 0}
+    directory = os.path.dirname(os.path.abspath(index_path))
+    os.makedirs(directory, exist_ok=True)
+    chunk_paths = []
+    try:
+        chunk = []
+        for record in _iter_records(dump_path, normalize, stats):
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                chunk_paths.append(_write_sorted_chunk(chunk, directory))
+                chunk = []
+        if chunk:
+            chunk_paths.append(_write_sorted_chunk(chunk, directory))
+        del chunk
+
+        offsets = array.array("Q")
+        files = [open(path, "rb") for path in chunk_paths]
+        try:
+            with open(index_path + ".keys.tmp", "wb") as keys_file:
+                position, previous = 0, None
+                for record in heapq.merge(*files):
+                    if record == previous: continue # Samma titel som både primär- och originaltitel i olika delfiler
+                    offsets.append(position)
+                    keys_file.write(record)
+                    position += len(record)
+                    previous = record
+                offsets.append(position) # Slutposition, så att post i slutar vid offsets[i + 1]
+        finally:
+            for f in files:
+                f.close()
+        if len(offsets) == 1:
+            os.remove(index_path + ".keys.tmp")
+            raise ValueError(f"Inga filmtitlar hittades i {dump_path}")
+        with open(index_path + ".offsets.tmp", "wb") as offsets_file:
+            offsets.tofile(offsets_file)
+        os.replace(index_path + ".keys.tmp", index_path + ".keys")
+        os.replace(index_path + ".offsets.tmp", index_path + ".offsets")
+    finally:
+        for path in chunk_paths:
+            os.remove(path)
+
+    stats["records"] = len(offsets) - 1
+    stats["keys_bytes"] = os.path.getsize(index_path + ".keys")
+    stats["offsets_bytes"] = os.path.getsize(index_path + ".offsets")
+    return stats
+
+
+class _Keys:
+    """Sekvens över nyckelposterna i mmap:en, så att bisect kan binärsöka utan att läsa in filen."""
+
+    def __init__(self, keys, offsets):
+        self.keys = keys
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.keys[self.offsets[i]:self.offsets[i + 1]]
+
+
+class ImdbIndex:
+    """Läser ett index byggt av import_title_basics. `normalize` ska vara samma som vid import."""
+
+    def __init__(self, index_path, normalize):
+        self.path = index_path
+        self.normalize = normalize
+        self._files = [open(index_path + ".keys", "rb"), open(index_path + ".offsets", "rb")]
+        self._keys_map = mmap.mmap(self._files[0].fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets_map = mmap.mmap(self._files[1].fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = memoryview(self._offsets_map).cast("Q")
+        self._records = _Keys(self._keys_map, self._offsets)
+
+    @staticmethod
+    def exists(index_path):
+        return os.path.exists(index_path + ".keys") and os.path.exists(index_path + ".offsets")
+
+    def __len__(self):
+        return len(self._records)
+
+    def candidates(self, title, year=None):
+        """Alla (år, typrang, tconst) för titeln (och året), i nyckelordning."""
+        normalized = self.normalize(title or "")
+        if not normalized.strip(): return []
+        prefix = index_key(normalized, year).encode("utf-8")
+        found = []
+        i = bisect.bisect_left(self._records, prefix)
+        while i < len(self._records):
+            record = self._records[i]
+            if not record.startswith(prefix): break
+            _, record_year, rank, tconst = record.decode("utf-8").rstrip("\n").split(SEP)
+            found.append((int(record_year) or None, int(rank), tconst))
+            i += 1
+        return found
+
+    def lookup(self, title, year=None, year_tolerance=1):
+        """tconst för titel och år (exakt år först, sedan ±year_tolerance), eller None.
+
+        Utan år returneras en träff bara om titeln är entydig bland de bäst rankade typerna.
+        """
+        if year:
+            for delta in [0] + [d for step in range(1, year_tolerance + 1) for d in (-step, step)]:
+                found = self.candidates(title, int(year) + delta)
+                if found:
+                    IMDB_INDEX_LOOKUPS.inc(outcome="hit")
+                    return min(found, key=lambda item: item[1])[2]
+        else:
+            found = self.candidates(title)
+            if found:
+                best_rank = min(rank for _, rank, _ in found)
+                best = {tconst for _, rank, tconst in found if rank == best_rank}
+                if len(best) == 1:
+                    IMDB_INDEX_LOOKUPS.inc(outcome="hit")
+                    return best.pop()
+                IMDB_INDEX_LOOKUPS.inc(outcome="ambiguous")
+                return None
+        IMDB_INDEX_LOOKUPS.inc(outcome="miss")
+        return None
+
+    def close(self):
+        self._records = None
+        self._offsets.release()
+        self._offsets_map.close()
+        self._keys_map.close()
+        for f in self._files:
+            f.close()
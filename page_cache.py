@@ -0,0 +1,283 @@
+# --- Sidcache för SFDb- och IMDb-hämtningar ---
+# Två nivåer: en storleksbegränsad LRU i minnet och en SQLite-fil på disk som
+# överlever omstarter av waitress. Inaktuella poster på disk revalideras med
+# ETag/Last-Modified så att oförändrade sidor bara kostar ett 304-svar.
+# Disknivån har ett tak på antal poster; de som lästs/skrivits längst sedan
+# (kolumnen last_access) tas bort först, så att filen inte växer obegränsat.
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode, urlsplit
+
+import requests
+
+from singleflight import SingleFlight
+
+
+class CachedPage:
+    """Minimal svarsliknande behållare för en cachad sida."""
+
+    def __init__(self, url, text, status_code=200, etag=None, last_modified=None, fetched_at=None):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+
+    def raise_for_status(self):
+        # Endast lyckade svar cachas, men behåll samma gränssnitt som requests.Response
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} för {self.url}")
+
+
+def make_cache_key(url, params=None):
+    """Bygger en stabil nyckel av URL och (sorterade) query-parametrar."""
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted(params.items()))}"
+
+
+class PageCache:
+    """Cache för råa HTML-svar med TTL per värd, LRU i minnet och SQLite på disk."""
+
+    def __init__(self, db_path=None, max_entries=512, default_ttl=3600, ttl_by_host=None, fetch=None,
+                 max_disk_entries=20000):
+        self.db_path = db_path
+        self.fetch = fetch or requests.get # Anropas som fetch(url, params=..., headers=..., timeout=...)
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.default_ttl = default_ttl
+        self.ttl_by_host = dict(ttl_by_host or {})
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self.flight = SingleFlight() # Samtidiga missar på samma URL delar på en hämtning
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "evictions": 0,
+                      "disk_evictions": 0}
+        self._puts_since_prune = 0
+        if db_path:
+            self._open_db()
+
+    # --- Disknivå ---
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " key TEXT PRIMARY KEY, url TEXT, body TEXT, etag TEXT,"
+                " last_modified TEXT, fetched_at REAL, last_access REAL)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(pages)")}
+            if "last_access" not in columns:
+                # Fil från en äldre version: räkna hämtningstiden som senaste användning
+                self._db.execute("ALTER TABLE pages ADD COLUMN last_access REAL")
+                self._db.execute("UPDATE pages SET last_access = fetched_at")
+            self._db.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Kunde inte öppna sidcachen {self.db_path}: {e}")
+            self._db = None
+            return
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Tar bort de minst nyligen använda posterna på disk över max_disk_entries."""
+        if self._db is None or not self.max_disk_entries: return
+        try:
+            with self._db_lock:
+                count = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+                excess = count - self.max_disk_entries
+                if excess <= 0: return
+                # Lite marginal så att vi inte rensar vid nästan varje ny post
+                excess += self.max_disk_entries // 10
+                self._db.execute(
+                    "DELETE FROM pages WHERE key IN (SELECT key FROM pages ORDER BY last_access LIMIT ?)", (excess,))
+                self._db.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Kunde inte rensa sidcachen: {e}")
+            return
+        with self._lock:
+            self.stats["disk_evictions"] += excess
+        logging.info("Rensade %d poster ur sidcachen på disk (tak %d).", excess, self.max_disk_entries)
+
+    def _disk_get(self, key):
+        if self._db is None: return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT url, body, etag, last_modified, fetched_at FROM pages WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    self._db.execute("UPDATE pages SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Läsfel i sidcachen för {key}: {e}")
+            return None
+        if not row: return None
+        url, body, etag, last_modified, fetched_at = row
+        return CachedPage(url, body, etag=etag, last_modified=last_modified, fetched_at=fetched_at)
+
+    def _disk_put(self, key, page):
+        if self._db is None: return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO pages (key, url, body, etag, last_modified, fetched_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, page.url, page.text, page.etag, page.last_modified, page.fetched_at, time.time()),
+                )
+                self._db.commit()
+                self._puts_since_prune += 1
+                prune = self._puts_since_prune >= max(1, self.max_disk_entries // 100)
+                if prune: self._puts_since_prune = 0
+        except sqlite3.Error as e:
+            logging.warning(f"Skrivfel i sidcachen för {key}: {e}")
+            return
+        if prune:
+            self._prune_disk()
+
+    # --- Minnesnivå ---
+
+    def _memory_get(self, key):
+        with self._lock:
+            page = self._memory.get(key)
+            if page is not None:
+                self._memory.move_to_end(key)
+            return page
+
+    def _memory_put(self, key, page):
+        with self._lock:
+            self._memory[key] = page
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    # --- Publikt gränssnitt ---
+
+    def ttl_for(self, url):
+        """TTL i sekunder för värden i URL:en."""
+        host = urlsplit(url).hostname or ""
+        return self.ttl_by_host.get(host, self.default_ttl)
+
+    def fresh_for(self, page, max_age=None):
+        """Sekunder tills posten blir inaktuell (0 om den redan är det). max_age kortar värdens TTL."""
+        ttl = self.ttl_for(page.url)
+        if max_age is not None: ttl = min(ttl, max_age)
+        return max(0.0, page.fetched_at + ttl - time.time())
+
+    def _is_fresh(self, page, max_age=None):
+        return self.fresh_for(page, max_age) > 0
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, url, params=None, headers=None, timeout=10, max_age=None):
+        """Returnerar en CachedPage, från cache om möjligt, annars från nätet.
+
+        Nätverksfel och felstatusar kastas som requests-undantag precis som vid
+        ett direkt anrop till requests.get. Med max_age räknas poster äldre än så
+        som inaktuella (och revalideras) även om värdens TTL är längre.
+        """
+        key = make_cache_key(url, params)
+        page, fresh = self._lookup(key, max_age)
+        if fresh: return page
+        return self.flight.do(key, self._fetch, key, url, params, headers, timeout, page)
+
+    def peek(self, url, params=None, max_age=None, stale=False):
+        """Returnerar en färsk CachedPage om den finns i cachen, annars None. Hämtar aldrig från nätet.
+
+        Med stale=True returneras även en inaktuell post (som get() skulle revalidera).
+        """
+        page, fresh = self._lookup(make_cache_key(url, params), max_age)
+        return page if fresh or stale else None
+
+    def put(self, url, text, params=None, etag=None, last_modified=None):
+        """Sparar en sida som hämtats utanför cachen (t.ex. strömmat) i båda nivåerna."""
+        key = make_cache_key(url, params)
+        page = CachedPage(url, text, etag=etag, last_modified=last_modified)
+        self._memory_put(key, page)
+        self._disk_put(key, page)
+        self._count("stores")
+        return page
+
+    def _lookup(self, key, max_age=None):
+        """(post, färsk) ur minne eller disk; posten kan vara inaktuell (för villkorlig hämtning) eller None."""
+        page = self._memory_get(key)
+        if page is not None and self._is_fresh(page, max_age):
+            self._count("memory_hits")
+            return page, True
+
+        if page is None:
+            page = self._disk_get(key)
+            if page is not None and self._is_fresh(page, max_age):
+                self._count("disk_hits")
+                self._memory_put(key, page)
+                return page, True
+        return page, False
+
+    def _fetch(self, key, url, params, headers, timeout, stale_page):
+        """Hämtar från nätet (villkorligt om en inaktuell post finns) och sparar i båda nivåerna."""
+        request_headers = dict(headers or {})
+        if stale_page is not None:
+            # Inaktuell post: fråga servern om sidan ändrats
+            if stale_page.etag: request_headers['If-None-Match'] = stale_page.etag
+            if stale_page.last_modified: request_headers['If-Modified-Since'] = stale_page.last_modified
+
+        response = self.fetch(url, params=params, headers=request_headers, timeout=timeout)
+
+        if response.status_code == 304 and stale_page is not None:
+            self._count("revalidated")
+            stale_page.fetched_at = time.time()
+            self._memory_put(key, stale_page)
+            self._disk_put(key, stale_page)
+            return stale_page
+
+        response.raise_for_status()
+        self._count("misses")
+        page = CachedPage(
+            response.url or url,
+            response.text,
+            status_code=response.status_code,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+        )
+        self._memory_put(key, page)
+        self._disk_put(key, page)
+        self._count("stores")
+        return page
+
+    def invalidate(self, url, params=None):
+        """Tar bort en post från båda nivåerna."""
+        key = make_cache_key(url, params)
+        with self._lock:
+            self._memory.pop(key, None)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM pages WHERE key = ?", (key,))
+                self._db.commit()
+
+    def clear(self, disk=False):
+        """Tömmer minnesnivån, och med disk=True även SQLite-filen."""
+        with self._lock:
+            self._memory.clear()
+        if disk and self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM pages")
+                self._db.commit()
+
+    def get_stats(self):
+        """Kopia av träff/miss-räknarna samt aktuell storlek i minnet."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"] + stats["revalidated"]
+        stats["coalesced"] = self.flight.get_stats()["shared"]
+        return stats
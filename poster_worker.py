@@ -0,0 +1,103 @@
+# --- Bakgrundsuppslag av postrar ---
+# Posteruppslag mot IMDb är det långsammaste steget, så det körs av en liten
+# pool av bakgrundstrådar i stället för i själva sökningen. Resultaten sparas
+# per SFDb-itemid; även "ingen poster" sparas, men med kortare TTL. Ett uppslag
+# som misslyckas (nätverksfel, tidsbudget, hastighetsgräns) sparas bara några
+# minuter, så att ett tillfälligt fel inte ser ut som "ingen poster" i timmar.
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class PosterResolver:
+    """Kö + resultatlager för postrar, nycklat på SFDb-itemid.
+
+    `resolve(itemid, title, year)` anropas i en bakgrundstråd och ska returnera
+    en poster-URL eller None (ingen poster finns). Tillfälliga fel ska kastas.
+    """
+
+    def __init__(self, resolve, workers=3, ttl=7 * 24 * 3600, negative_ttl=6 * 3600, retry_ttl=5 * 60, max_entries=5000):
+        self.resolve = resolve
+        self.workers = workers
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.retry_ttl = retry_ttl
+        self.max_entries = max_entries
+        self._results = {} # itemid -> (poster_url eller None, löper ut, misslyckat uppslag)
+        self._pending = {} # itemid -> Future
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_started(self):
+        # Trådarna startas först när något köas, så att import av appen är billig
+        if self._threads: return
+        with self._lock:
+            if self._threads: return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"poster-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def lookup(self, itemid):
+        """Returnerar (träff, poster_url). träff=False om inget giltigt resultat finns sparat."""
+        with self._lock:
+            entry = self._results.get(itemid)
+            if entry is None: return False, None
+            poster_url, expires_at, _ = entry
+            if time.time() >= expires_at:
+                del self._results[itemid]
+                return False, None
+            return True, poster_url
+
+    def failed(self, itemid):
+        """True om det sparade resultatet kommer från ett misslyckat uppslag (försöks igen snart)."""
+        with self._lock:
+            entry = self._results.get(itemid)
+            return entry is not None and entry[2]
+
+    def request(self, itemid, title=None, year=None):
+        """Köar ett uppslag (om det inte redan finns eller pågår) och returnerar en Future med URL:en."""
+        hit, poster_url = self.lookup(itemid)
+        if hit:
+            future = Future()
+            future.set_result(poster_url)
+            return future
+        with self._lock:
+            future = self._pending.get(itemid)
+            if future is not None: return future
+            future = Future()
+            self._pending[itemid] = future
+        self._ensure_started()
+        self._queue.put((itemid, title, year))
+        return future
+
+    def _store(self, itemid, poster_url, failed=False):
+        ttl = self.retry_ttl if failed else self.ttl if poster_url else self.negative_ttl
+        with self._lock:
+            if len(self._results) >= self.max_entries:
+                # Släng de poster som går ut först
+                for old_itemid, _ in sorted(self._results.items(), key=lambda item: item[1][1])[:self.max_entries // 10 or 1]:
+                    del self._results[old_itemid]
+            self._results[itemid] = (poster_url, time.time() + ttl, failed)
+            return self._pending.pop(itemid, None)
+
+    def _run(self):
+        while True:
+            itemid, title, year = self._queue.get()
+            poster_url, failed = None, False
+            try:
+                poster_url = self.resolve(itemid, title, year)
+            except Exception as e:
+                failed = True
+                logging.error(f"Fel vid posteruppslag för {itemid}: {e}")
+            future = self._store(itemid, poster_url, failed)
+            if future is not None:
+                future.set_result(poster_url)
+            self._queue.task_done()
+
+    def queue_depth(self):
+        return self._queue.qsize()
@@ -0,0 +1,64 @@
+# --- Topp-k-beskärning av kandidater ---
+# Varje kandidat har en optimistisk sorteringsnyckel (bästa möjliga placering om
+# originaltiteln skulle ge full poäng) och, om den redan säkert passerar
+# tröskeln, en pessimistisk nyckel (placering med bara det som redan är känt).
+# När k kandidater säkert ligger före en kandidats optimistiska nyckel kan den
+# inte nå topp-k och behöver inte hämtas. Lägre nyckel = bättre placering.
+
+import heapq
+
+
+class TopKPruner:
+    """Väljer vilka kandidater som ska hämtas i detalj, bäst-först och inom en budget.
+
+    Nycklarna måste vara totalt ordnade (t.ex. sluta med kandidatens index) för
+    att beskärningen ska ge exakt samma topp-k som en fullständig sortering.
+    """
+
+    def __init__(self, k, budget=None):
+        self.k = k
+        self.budget = budget # Max antal hämtningar, None = obegränsat
+        self.optimistic = {}
+        self.pessimistic = {} # Endast kandidater som säkert passerar tröskeln
+        self.waiting = [] # Heap av (optimistisk nyckel, id) som ännu inte hämtats
+        self.fetched = 0
+        self.pruned = []
+
+    def add(self, candidate_id, optimistic_key, pessimistic_key=None):
+        self.optimistic[candidate_id] = optimistic_key
+        if pessimistic_key is not None:
+            self.pessimistic[candidate_id] = pessimistic_key
+        heapq.heappush(self.waiting, (optimistic_key, candidate_id))
+
+    def bound(self):
+        """Den k:e bästa säkra nyckeln, eller None om färre än k kandidater säkert passerar."""
+        if len(self.pessimistic) < self.k: return None
+        return heapq.nsmallest(self.k, self.pessimistic.values())[-1]
+
+    def take(self, n):
+        """Upp till n kandidater att hämta härnäst. Kandidater som inte längre kan nå topp-k beskärs."""
+        taken = []
+        bound = self.bound()
+        while self.waiting and len(taken) < n:
+            if self.budget is not None and self.fetched >= self.budget: break
+            optimistic_key, candidate_id = self.waiting[0]
+            if bound is not None and optimistic_key > bound:
+                # Heapen är sorterad på optimistisk nyckel, så resten kan inte heller nå topp-k
+                self.pruned.extend(candidate_id for _, candidate_id in self.waiting)
+                self.waiting = []
+                break
+            heapq.heappop(self.waiting)
+            self.fetched += 1
+            taken.append(candidate_id)
+        return taken
+
+    def settle(self, candidate_id, exact_key):
+        """Registrerar en hämtad kandidats slutliga nyckel (None om den inte passerade tröskeln)."""
+        if exact_key is None:
+            self.pessimistic.pop(candidate_id, None)
+        else:
+            self.pessimistic[candidate_id] = exact_key
+
+    def unfetched(self):
+        """Kandidater som varken hämtats eller beskurits (budgeten tog slut)."""
+        return [candidate_id for _, candidate_id in sorted(self.waiting)]
@@ -0,0 +1,115 @@
+# --- Hastighetsbegränsning per värd ---
+# En token bucket per uppströmsvärd, delad av alla trådar i processen. Den
+# anpassar sig efter signaler från servern: Retry-After respekteras och 429/5xx
+# ger exponentiell backoff som gäller alla anrop mot värden, inte bara den
+# tråd som fick felet.
+
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+BACKOFF_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """Väntan på en token skulle ta längre tid än tillåtet."""
+
+
+def parse_retry_after(value):
+    """Retry-After i sekunder (heltal eller HTTP-datum), eller None."""
+    if not value: return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket med `rate` tokens/s och plats för `capacity` tokens, plus en spärr för backoff."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Tar en token och returnerar hur länge anroparen måste vänta innan anropet får göras."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1 # Får bli negativt: efterföljande anropare köar bakom
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+
+class HostRateLimiter:
+    """Processgemensam begränsare med en TokenBucket per värd."""
+
+    def __init__(self, host_rates=None, default_rate=(4.0, 4), base_backoff=1.0, max_backoff=60.0, max_wait=30.0):
+        self.host_rates = dict(host_rates or {})
+        self.default_rate = default_rate
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_wait = max_wait
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "waited_seconds": 0.0, "backoffs": 0}
+
+    def bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, capacity = self.host_rates.get(host, self.default_rate)
+                bucket = self._buckets[host] = TokenBucket(rate, capacity)
+            return bucket
+
+    def acquire(self, host, max_wait=None):
+        """Blockerar tills ett anrop mot värden är tillåtet. Kastar RateLimitExceeded om väntan blir för lång.
+
+        `max_wait` kan korta av väntetaket för ett enskilt anrop (t.ex. till återstående tidsbudget).
+        """
+        bucket = self.bucket(host)
+        wait = bucket.reserve()
+        if wait > (self.max_wait if max_wait is None else min(self.max_wait, max_wait)):
+            with bucket.lock:
+                bucket.tokens += 1 # Lämna tillbaka token, anropet görs inte
+            raise RateLimitExceeded(f"{host} är spärrad i {wait:.0f}s till (backoff)")
+        if wait > 0:
+            time.sleep(wait)
+        with self._lock:
+            self.stats["acquired"] += 1
+            self.stats["waited_seconds"] += wait
+
+    def report(self, host, status_code, retry_after=None):
+        """Återkoppling efter ett svar: 429/5xx spärrar värden, lyckade svar nollställer backoff."""
+        bucket = self.bucket(host)
+        with bucket.lock:
+            if status_code not in BACKOFF_STATUSES:
+                bucket.failures = 0
+                return
+            bucket.failures += 1
+            delay = parse_retry_after(retry_after)
+            if delay is None:
+                delay = min(self.max_backoff, self.base_backoff * 2 ** (bucket.failures - 1))
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+        with self._lock:
+            self.stats["backoffs"] += 1
+        logging.warning(f"{host} svarade {status_code}, pausar anrop i {delay:.1f}s")
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
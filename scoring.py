@@ -0,0 +1,58 @@
+# --- Titelnormalisering och poängsättning ---
+# Samma regler som tidigare normalize_title/fuzz.token_set_ratio, men med
+# förkompilerade mönster, en LRU-memoiserad normalisering och RapidFuzz för
+# både enstaka par och hela kandidatlistor (process.extract med score_cutoff).
+
+import logging
+import re
+import unicodedata
+from functools import lru_cache
+
+from rapidfuzz import fuzz, process
+
+TRAILING_YEAR_RE = re.compile(r'\s*\(\d{4}\)$')
+PUNCTUATION_TO_DROP = str.maketrans('', '', ':[]')
+NON_ALNUM_RE = re.compile(r'[^a-zA-Z0-9\s]')
+
+
+@lru_cache(maxsize=8192)
+def normalize_title(title):
+    """Normalisera titlar."""
+    if not title: return ""
+    try:
+        title_no_year = TRAILING_YEAR_RE.sub('', title).strip()
+        title_no_year = title_no_year.translate(PUNCTUATION_TO_DROP)
+        title = unicodedata.normalize('NFKD', title_no_year).encode('ascii', 'ignore').decode('utf-8')
+        title = NON_ALNUM_RE.sub('', title)
+        return title.lower().strip()
+    except Exception as e:
+        logging.warning(f"Kunde inte normalisera titel: {title} - Fel: {e}")
+        try:
+            return NON_ALNUM_RE.sub('', title).lower().strip()
+        except:
+             return title.lower()
+
+
+def title_score(normalized_a, normalized_b):
+    """token_set_ratio (0-100, heltal) mellan två redan normaliserade titlar."""
+    return int(round(fuzz.token_set_ratio(normalized_a, normalized_b)))
+
+
+def score_titles(normalized_query, titles, score_cutoff=0):
+    """Poängsätter en normaliserad söktitel mot många (onormaliserade) titlar i ett anrop.
+
+    Returnerar en lista med heltalspoäng i samma ordning som `titles`; poäng under
+    `score_cutoff` blir 0. (process.extract i stället för cdist för att slippa numpy.)
+    """
+    scores = [0] * len(titles)
+    for _, score, index in best_matches(normalized_query, titles, score_cutoff=score_cutoff, limit=None):
+        scores[index] = score
+    return scores
+
+
+def best_matches(normalized_query, titles, score_cutoff=0, limit=10):
+    """De `limit` bästa titlarna som (titel, poäng, index), bäst först. limit=None ger alla över score_cutoff."""
+    choices = [normalize_title(title) for title in titles]
+    matches = process.extract(normalized_query, choices, scorer=fuzz.token_set_ratio,
+                              score_cutoff=score_cutoff, limit=limit)
+    return [(titles[index], int(round(score)), index) for _, score, index in matches]
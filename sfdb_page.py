@@ -0,0 +1,148 @@
+# --- Modell för en SFDb-filmsida ---
+# Sidan hämtas och parsas en gång; titel, originaltitel, år, DCP-status och
+# övriga rader i information-tabellerna räknas fram först när de efterfrågas.
+
+import logging
+import re
+from functools import cached_property
+
+from html_parser import parse_html
+
+DCP_WORD_RE = re.compile(r'\bDCP\b')
+
+
+def extract_itemid_from_url(url):
+    """Extraherar itemid från en SFDb URL."""
+    if not url: return None
+    match = re.search(r'itemid=(\d+)', url)
+    if match:
+        return match.group(1)
+    match = re.search(r'-(\d+)/?$', url)
+    if match:
+        return match.group(1)
+    return None
+
+
+class SfdbMoviePage:
+    """En parsad SFDb-filmsida. Alla fält är lata och beräknas högst en gång."""
+
+    def __init__(self, url, html):
+        self.url = url
+        self.html = html
+
+    @cached_property
+    def soup(self):
+        # Hela dokumentet behövs: DCP-kontrollen läser sidans samlade text
+        return parse_html(self.html, document="sfdb_film")
+
+    @cached_property
+    def canonical_url(self):
+        """Sidans kanoniska URL (link rel=canonical eller og:url), om den finns."""
+        canonical = self.soup.find('link', rel='canonical')
+        if canonical and canonical.get('href'): return canonical['href']
+        og_url = self.soup.find('meta', property='og:url')
+        if og_url and og_url.get('content'): return og_url['content']
+        return None
+
+    @cached_property
+    def itemid(self):
+        """itemid från sidans kanoniska URL, annars från URL:en sidan hämtades från."""
+        return extract_itemid_from_url(self.canonical_url) or extract_itemid_from_url(self.url)
+
+    # --- Rubrik ---
+
+    @cached_property
+    def _heading_tag(self):
+        return self.soup.select_one('h1.page-header__heading')
+
+    @cached_property
+    def title(self):
+        """Titeln i sidans h1 utan årtalet, eller None om rubriken saknas."""
+        if not self._heading_tag: return None
+        # Hoppa över årtalsspannet utan att ändra i trädet (DCP-sökningen läser hela texten)
+        parts = []
+        for text in self._heading_tag.find_all(string=True):
+            if text.find_parent('span', class_='page-header__heading--release'): continue
+            text = text.strip()
+            if text: parts.append(text)
+        return "".join(parts) or None
+
+    @cached_property
+    def year(self):
+        """Premiärår från rubrikens årtalsspann, som int."""
+        if not self._heading_tag: return None
+        year_span = self._heading_tag.find('span', class_='page-header__heading--release')
+        if not year_span: return None
+        year_match = re.search(r'(\d{4})', year_span.get_text(strip=True))
+        return int(year_match.group(1)) if year_match else None
+
+    # --- Information-tabeller ---
+
+    def section_table(self, section_id):
+        """Returnerar table.information-table under rubriken h2#<section_id>, om den finns."""
+        heading = self.soup.find('h2', id=section_id)
+        if not heading: return None
+        foldout_div = heading.find_next_sibling('div', class_='accordion__foldout')
+        if not foldout_div: return None
+        return foldout_div.select_one('table.information-table')
+
+    def section_rows(self, section_id):
+        """Lista av (th-tagg, td-tagg) för raderna i en sektions information-tabell."""
+        info_table = self.section_table(section_id)
+        if not info_table: return []
+        return [(row.find('th'), row.find('td')) for row in info_table.find_all('tr')]
+
+    @cached_property
+    def information(self):
+        """Alla information-tabeller som {sektions-id: {rubrik: värde}}."""
+        sections = {}
+        for heading in self.soup.find_all('h2', id=True):
+            rows = {}
+            for th, td in self.section_rows(heading['id']):
+                if th and td:
+                    rows[th.get_text(strip=True)] = td.get_text(" ", strip=True)
+            if rows:
+                sections[heading['id']] = rows
+        return sections
+
+    @cached_property
+    def original_title(self):
+        """Originaltitel från sektionen 'titles', utan eventuellt parentestillägg."""
+        for th, td in self.section_rows('titles'):
+            if th and td and 'originaltitel' in th.get_text(strip=True).lower():
+                li = td.find('li')
+                original_title_text = li.get_text(strip=True) if li else td.get_text(strip=True)
+                if '(' in original_title_text and ')' in original_title_text:
+                    ot_simple = re.sub(r'\s*\(.*\)$', '', original_title_text).strip()
+                    original_title = ot_simple if ot_simple else original_title_text
+                else:
+                    original_title = original_title_text
+                logging.debug("  > SFDb Originaltitel hittad: %s", original_title)
+                return original_title
+        logging.debug("  > Ingen SFDb originaltitel hittad i tabellen för %s", self.url)
+        return None
+
+    # --- DCP ---
+
+    @cached_property
+    def dcp_available(self):
+        """True om 'DCP' nämns på sidan (i brödtext, distributionstabell eller teknisk data)."""
+        page_text = self.soup.get_text(separator=" ", strip=True).upper()
+        if DCP_WORD_RE.search(page_text):
+            logging.info(f"DCP hittades på {self.url}")
+            return True
+        for th, td in self.section_rows('companies'):
+            if th and 'DCP' in th.get_text(strip=True).upper():
+                logging.info(f"DCP hittades via specifik distributions-rad på {self.url}")
+                return True
+            if td and 'DCP' in td.get_text(strip=True).upper():
+                logging.info(f"DCP hittades i distributions-td på {self.url}")
+                return True
+        possible_sections = self.soup.select('div.technical-data, div.distribution-info, dl.attributes dt, dl.attributes dd')
+        for section in possible_sections:
+            section_text = section.get_text(separator=" ", strip=True).upper()
+            if "DCP" in section_text:
+                logging.info(f"DCP hittades i möjlig teknisk/dist-sektion på {self.url}")
+                return True
+        logging.info(f"DCP nämndes INTE på {self.url}")
+        return False
@@ -0,0 +1,70 @@
+# --- Single-flight ---
+# Samtidiga anrop med samma nyckel delar på ett enda pågående anrop: den första
+# anroparen kör funktionen, övriga väntar på samma resultat (eller undantag).
+# Varje väntande anropare håller sin egen tidsbudget (deadline.py): den väntar
+# högst den tid som är kvar, och tar ledarens budget slut försöker den själv.
+
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import deadline
+
+
+class SingleFlight:
+    """Slår ihop samtidiga identiska anrop. Räknar hur många uppströmsanrop som sparats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.stats = {"calls": 0, "executed": 0, "shared": 0}
+
+    def do(self, key, func, *args, **kwargs):
+        """Kör func(*args, **kwargs), eller väntar på ett redan pågående anrop med samma nyckel.
+
+        En väntande anropare kastar DeadlineExceeded när dess egen tidsbudget tar slut.
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader: return self._lead(key, future, func, *args, **kwargs)
+            try:
+                return future.result(timeout=deadline.remaining())
+            except FutureTimeoutError:
+                raise deadline.DeadlineExceeded(f"Tidsbudgeten tog slut i väntan på {key!r}") from None
+            except deadline.DeadlineExceeded:
+                # Ledarens budget tog slut, inte nödvändigtvis vår: försök igen om tid finns kvar
+                if deadline.expired(): raise
+
+    def _join(self, key):
+        with self._lock:
+            self.stats["calls"] += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats["shared"] += 1
+                leader = False
+            else:
+                future = self._in_flight[key] = Future()
+                self.stats["executed"] += 1
+                leader = True
+            return future, leader
+
+    def _lead(self, key, future, func, *args, **kwargs):
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key):
+        # Tas bort innan väntarna väcks, så att en som försöker igen inte hittar samma anrop
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._in_flight)
+            return stats
@@ -0,0 +1,24 @@
+import os
+import socket
+import sys
+
+# Modulerna ligger platt i repots rot
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+
+def _closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# app.py läser konfigurationen vid import: inga cache-, index- eller bevakningsfiler,
+# ingen schemaläggare, korta tidsbudgetar, och uppströmsvärdarna pekar på en stängd port så att inget
+# test når det riktiga SFDb eller IMDb.
+for _name in ("PAGE_CACHE_PATH", "SFDB_INDEX_PATH", "IMDB_INDEX_PATH", "WATCHLIST_PATH"):
+    os.environ[_name] = ""
+os.environ["WATCHLIST_SCHEDULER"] = "0"
+os.environ["REQUEST_DEADLINE_SECONDS"] = "1"
+os.environ["POSTER_DEADLINE_SECONDS"] = "1"
+os.environ["SFDB_BASE_URL"] = f"http://127.0.0.1:{_closed_port()}"
+os.environ["IMDB_BASE_URL"] = f"http://localhost:{_closed_port()}"
@@ -0,0 +1,25 @@
+"""JSON-API:t när SFDb inte går att nå (uppströmsvärdarna pekar på en stängd port, se conftest)."""
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client():
+    app.page_cache.clear()
+    return app.app.test_client()
+
+
+def test_details_upstream_failure_is_not_cached(client):
+    response = client.get("/api/details/3001")
+    assert response.status_code in (502, 504)
+    assert response.headers["Cache-Control"] == "no-store"
+    assert "ETag" not in response.headers
+    assert "dcp_available" not in response.get_json()
+
+
+def test_details_html_upstream_failure(client):
+    response = client.get("/details/3001")
+    assert response.status_code in (502, 504)
+    assert "Kunde inte nå SFDb" in response.get_data(as_text=True)
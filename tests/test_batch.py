@@ -0,0 +1,28 @@
+"""parse_programme: giltiga programlistor tolkas, andra JSON-former ger ValueError."""
+
+import pytest
+
+from batch import parse_programme
+
+
+def test_json_list_and_titles_object():
+    expected = [{"title": "Persona", "year": "1966", "itemid": ""}, {"title": "Sommar", "year": "", "itemid": ""}]
+    assert parse_programme('[{"title": "Persona", "year": 1966}, "Sommar"]') == expected
+    assert parse_programme('{"titles": [{"titel": "Persona", "år": "1966"}, "Sommar"]}') == expected
+
+
+def test_csv_with_header():
+    assert parse_programme("title;year\nPersona;1966\n") == [{"title": "Persona", "year": "1966", "itemid": ""}]
+
+
+@pytest.mark.parametrize("content", [
+    '{"titles": 5}',
+    '{"titles": "Persona"}',
+    '"Persona"',
+    '[1966]',
+    '[["Persona", 1966]]',
+    '[null]',
+])
+def test_invalid_json_shapes_raise_value_error(content):
+    with pytest.raises(ValueError):
+        parse_programme(content, "programme.json")
@@ -0,0 +1,77 @@
+"""Golden-tester: den strömmade DCP-kontrollen ska ge samma svar som SfdbMoviePage.dcp_available."""
+
+import io
+import os
+
+import pytest
+
+from dcp_scan import detect_dcp
+from sfdb_page import SfdbMoviePage
+
+FILM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "bench", "fixtures", "sfdb_film")
+FILM_FIXTURES = sorted(name for name in os.listdir(FILM_DIR) if name.endswith(".html"))
+
+
+class StreamedResponse:
+    """Det lilla av requests.Response som detect_dcp använder, för en sida i minnet."""
+
+    def __init__(self, body, content_length=True):
+        self.raw = io.BytesIO(body.encode("utf-8"))
+        self.headers = {"Content-Length": str(len(self.raw.getvalue()))} if content_length else {}
+        self.encoding = "utf-8"
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        while True:
+            chunk = self.raw.read(chunk_size)
+            if not chunk: return
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def stream(body, chunk_size=64, **kwargs):
+    stored = []
+    result = detect_dcp(lambda url, **_: StreamedResponse(body, **kwargs), "http://sfdb.test/film", chunk_size=chunk_size,
+                        on_complete=lambda response, text: stored.append(text))
+    return result, stored
+
+
+@pytest.mark.parametrize("name", FILM_FIXTURES)
+def test_fixture_pages_match_full_parse(name):
+    with open(os.path.join(FILM_DIR, name), encoding="utf-8") as f:
+        html = f.read()
+    result, _ = stream(html)
+    assert result == SfdbMoviePage("http://sfdb.test/film", html).dcp_available
+
+
+@pytest.mark.parametrize("html", [
+    "<html><body><p>Kopia<p>DCP</p></body></html>",
+    "<html><body>Format:<td>DCP</td></body></html>",
+    "<html><body><ul><li>35mm<li>DCP</ul></body></html>",
+    "<html><body>DCP</option>-kopia</body></html>",
+    "<html><body><p>Visas som <div>DCP</div> och 35mm</p></body></html>",
+    "<html><body><b>Format</b> <i>DCP</i></body></html>",
+    "<html><body>D<b>CP</b></body></html>",
+])
+def test_misnested_markup_matches_full_parse(html):
+    result, _ = stream(html, chunk_size=7)
+    assert result == SfdbMoviePage("http://sfdb.test/film", html).dcp_available
+
+
+def test_complete_page_is_handed_to_on_complete():
+    html = "<html><body><p>Format: 35mm</p></body></html>"
+    result, stored = stream(html)
+    assert result is False
+    assert stored == [html]
+
+
+def test_stops_reading_once_dcp_is_found():
+    html = "<html><body><p>Format: DCP</p>" + "<p>Övrigt</p>" * 5000 + "</body></html>"
+    result, stored = stream(html, content_length=False)
+    assert result is True
+    assert stored == [] # Sidan lästes inte klart, så den kan inte sparas
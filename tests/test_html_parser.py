@@ -0,0 +1,109 @@
+"""Golden-fixture-tester: delparsning (SoupStrainer) och lxml ska ge samma resultat
+som en full parsning med html.parser för app.py:s och sfdb_page.py:s selectors."""
+
+import json
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+import html_parser
+from html_parser import parse_html, SFDB_SEARCH_RESULTS, IMDB_FIND_RESULTS, IMDB_TITLE_POSTER
+from sfdb_page import SfdbMoviePage
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "bench", "fixtures")
+FILM_FIXTURES = sorted(name for name in os.listdir(os.path.join(FIXTURES_DIR, "sfdb_film")) if name.endswith(".html"))
+
+BACKENDS = [
+    "html.parser",
+    pytest.param("lxml", marks=pytest.mark.skipif(not html_parser.LXML_AVAILABLE, reason="lxml är inte installerat")),
+]
+
+
+def read_fixture(*parts):
+    with open(os.path.join(FIXTURES_DIR, *parts), encoding="utf-8") as f:
+        return f.read()
+
+
+def reference_soup(markup):
+    return BeautifulSoup(markup, "html.parser")
+
+
+# --- Samma selectors som extraktorerna i app.py ---
+
+def sfdb_results(soup):
+    results = []
+    for item in soup.select('ul.list li.list__item'):
+        link_tag = item.select_one('a.list__link')
+        heading_tag = item.select_one('h3.list__heading')
+        type_tag = item.select_one('div.list__type')
+        results.append((link_tag.get('href') if link_tag else None,
+                        heading_tag.get_text(strip=True) if heading_tag else None,
+                        type_tag.get_text(strip=True) if type_tag else None))
+    return results
+
+
+def imdb_find_hits(soup):
+    possible_results = soup.select('main section[data-testid="find-results-section-title"] ul li div')
+    if not possible_results:
+        possible_results = soup.select('.findResult')
+    hits = []
+    for result in possible_results:
+        title_tag = result.select_one('a[class*="ipc-metadata-list-summary-item__t"], .result_text a')
+        year_tag = result.select_one('span[class*="ipc-metadata-list-summary-item__li"], .result_text')
+        if not title_tag: continue
+        hits.append((title_tag.get_text(strip=True), title_tag.get('href'), year_tag.get_text(strip=True) if year_tag else None))
+    return hits
+
+
+def imdb_poster_sources(soup):
+    """(JSON-LD-bild, img-selector, og:image), i den ordning scrape_imdb_poster provar dem."""
+    json_ld = None
+    json_ld_script = soup.find('script', type='application/ld+json')
+    if json_ld_script:
+        json_ld = json.loads(json_ld_script.string).get('image')
+    poster_img = soup.select_one('div[class*="poster"] img[class*="ipc-image"]')
+    og_image = soup.find('meta', property='og:image')
+    return json_ld, poster_img.get('src') if poster_img else None, og_image.get('content') if og_image else None
+
+
+# --- Tester ---
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_sfdb_search_results(backend):
+    markup = read_fixture("sfdb_search.html")
+    expected = sfdb_results(reference_soup(markup))
+    assert expected
+    assert sfdb_results(parse_html(markup, only=SFDB_SEARCH_RESULTS, backend=backend)) == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_imdb_find_hits(backend):
+    markup = read_fixture("imdb_find.html")
+    expected = imdb_find_hits(reference_soup(markup))
+    assert expected
+    assert imdb_find_hits(parse_html(markup, only=IMDB_FIND_RESULTS, backend=backend)) == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_imdb_poster_url(backend):
+    markup = read_fixture("imdb_title.html")
+    expected = imdb_poster_sources(reference_soup(markup))
+    assert any(expected)
+    assert imdb_poster_sources(parse_html(markup, only=IMDB_TITLE_POSTER, backend=backend)) == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("fixture", FILM_FIXTURES)
+def test_sfdb_movie_page_fields(backend, fixture, monkeypatch):
+    markup = read_fixture("sfdb_film", fixture)
+    url = f"https://www.svenskfilmdatabas.se/sv/item/?type=film&itemid={fixture[:-5]}"
+
+    monkeypatch.setattr(html_parser, "PARSER_BACKEND", "html.parser")
+    reference = SfdbMoviePage(url, markup)
+    expected = (reference.title, reference.original_title, reference.year, reference.dcp_available, reference.itemid)
+    assert expected[0]
+
+    monkeypatch.setattr(html_parser, "PARSER_BACKEND", backend)
+    page = SfdbMoviePage(url, markup)
+    assert (page.title, page.original_title, page.year, page.dcp_available, page.itemid) == expected
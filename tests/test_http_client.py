@@ -0,0 +1,37 @@
+"""Anslutningsfel under en tidsbudget ska nå anroparen som requests-undantag."""
+
+import socket
+
+import pytest
+import requests
+
+import deadline
+from http_client import HttpClient
+
+
+def closed_port_url():
+    # En port som just frigjorts: anslutningen nekas direkt
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/"
+
+
+def test_connect_failure_under_deadline_is_request_exception():
+    client = HttpClient(hedge_hosts=set())
+    try:
+        with deadline.within(0.3):
+            with pytest.raises(deadline.DeadlineExceeded) as excinfo:
+                client.get(closed_port_url())
+        assert isinstance(excinfo.value, requests.RequestException)
+    finally:
+        client.close()
+
+
+def test_connect_failure_without_deadline_is_connection_error():
+    client = HttpClient(hedge_hosts=set())
+    try:
+        with pytest.raises(requests.ConnectionError):
+            client.get(closed_port_url(), timeout=1)
+    finally:
+        client.close()
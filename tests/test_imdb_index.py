@@ -0,0 +1,93 @@
+"""Import av title.basics och uppslag i ImdbIndex, med bench/fixtures/title.basics.sample.tsv."""
+
+import os
+
+import pytest
+
+from imdb_index import ImdbIndex, import_title_basics
+from scoring import normalize_title
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "bench", "fixtures",
+                           "title.basics.sample.tsv")
+
+
+def read_sample():
+    with open(SAMPLE_DUMP, encoding="utf-8") as f:
+        return f.read()
+
+
+def build(tmp_path, dump=SAMPLE_DUMP, name="imdb_index", **kwargs):
+    index_path = str(tmp_path / name)
+    stats = import_title_basics(dump, index_path, normalize_title, **kwargs)
+    return index_path, stats
+
+
+@pytest.fixture
+def index(tmp_path):
+    index_path, _ = build(tmp_path)
+    imdb_index = ImdbIndex(index_path, normalize_title)
+    yield imdb_index
+    imdb_index.close()
+
+
+def test_exact_year(index):
+    assert index.lookup("Summer with Monika", 1953) == "tt0046345"
+    assert index.lookup("Sommaren med Monika", 1953) == "tt0046345" # Originaltiteln indexeras också
+    assert index.lookup("smultronstallet", "1957") == "tt0050986"
+
+
+def test_year_within_tolerance(index):
+    assert index.lookup("Sommaren med Monika", 1954) == "tt0046345"
+    assert index.lookup("Sommaren med Monika", 1952) == "tt0046345"
+    assert index.lookup("Sommaren med Monika", 1955) is None
+
+
+def test_film_type_is_preferred_for_the_same_title_and_year(index):
+    # Sommarlek 1951 finns både som movie och tvMovie
+    assert index.lookup("Sommarlek", 1951) == "tt0043048"
+
+
+def test_ambiguous_title_without_year(index):
+    assert index.lookup("Persona") is None # Två filmer, 1966 och 2009
+    assert index.lookup("Persona", 2009) == "tt7654321"
+    # Filmen går före kortfilmen med samma titel, så den är entydig
+    assert index.lookup("Sommaren") == "tt0114511"
+    assert index.lookup("Bohemios") == "tt0000502" # Okänt år
+
+
+def test_unsupported_title_types_are_skipped(index):
+    assert index.lookup("Sommar") is None # tvSeries
+    assert index.lookup("Det sjunde inseglet", 2001) is None # tvEpisode
+    assert index.lookup("Det sjunde inseglet", 1957) == "tt0050976"
+
+
+def test_adult_titles_are_skipped(tmp_path):
+    dump = tmp_path / "title.basics.tsv"
+    dump.write_text(read_sample() + "tt9999999\tmovie\tSommarnöje\tSommarnöje\t1\t1975\t\\N\t80\tAdult\n", encoding="utf-8")
+    index_path, _ = build(tmp_path, dump=str(dump))
+    imdb_index = ImdbIndex(index_path, normalize_title)
+    try:
+        assert imdb_index.lookup("Sommarnöje", 1975) is None
+        assert imdb_index.lookup("Sommaren med Monika", 1953) == "tt0046345"
+    finally:
+        imdb_index.close()
+
+
+def test_dump_without_movie_titles_raises(tmp_path):
+    header, *rows = read_sample().splitlines(keepends=True)
+    dump = tmp_path / "title.basics.tsv"
+    dump.write_text(header + "".join(row for row in rows if "\ttvSeries\t" in row or "\ttvEpisode\t" in row), encoding="utf-8")
+    with pytest.raises(ValueError):
+        build(tmp_path, dump=str(dump))
+    assert not ImdbIndex.exists(str(tmp_path / "imdb_index"))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith((".chunk", ".tmp"))]
+
+
+def test_multi_chunk_import_matches_single_chunk(tmp_path):
+    single_path, single_stats = build(tmp_path, name="single")
+    multi_path, multi_stats = build(tmp_path, name="multi", chunk_size=2)
+    assert single_stats == multi_stats
+    for suffix in (".keys", ".offsets"):
+        with open(single_path + suffix, "rb") as single, open(multi_path + suffix, "rb") as multi:
+            assert single.read() == multi.read()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".chunk")]
@@ -0,0 +1,49 @@
+"""PosterResolver: tillfälliga fel sparas kort (retry_ttl), bara "ingen poster" blir ett negativt svar."""
+
+import time
+
+import pytest
+import requests
+
+import app
+import deadline
+from poster_worker import PosterResolver
+
+
+def resolve_and_wait(resolver, itemid, title="Sommaren med Monika", year=1953):
+    return resolver.request(itemid, title, year).result(timeout=10)
+
+
+@pytest.mark.parametrize("error", [
+    deadline.DeadlineExceeded("slut på tid"),
+    requests.ConnectionError("nekad"),
+])
+def test_transient_error_is_stored_as_failed(error):
+    def resolve(itemid, title, year):
+        raise error
+    resolver = PosterResolver(resolve, workers=1, negative_ttl=3600, retry_ttl=60)
+    assert resolve_and_wait(resolver, "1") is None
+    assert resolver.failed("1")
+    assert resolver._results["1"][1] <= time.time() + 60
+
+
+def test_missing_poster_is_stored_as_negative():
+    resolver = PosterResolver(lambda itemid, title, year: None, workers=1, negative_ttl=3600, retry_ttl=60)
+    assert resolve_and_wait(resolver, "1") is None
+    assert not resolver.failed("1")
+    assert resolver.lookup("1") == (True, None)
+    assert resolver._results["1"][1] > time.time() + 60
+
+
+def test_unreachable_imdb_is_stored_as_failed():
+    # IMDb pekar på en stängd port (conftest); både med och utan tidsbudget ska felet kastas vidare
+    def resolve(itemid, title, year):
+        with deadline.within(0.3):
+            return app.resolve_poster(itemid, title, year)
+    resolver = PosterResolver(resolve, workers=1, retry_ttl=60)
+    assert resolve_and_wait(resolver, "2") is None
+    assert resolver.failed("2")
+
+    with pytest.raises(requests.RequestException):
+        with deadline.within(0.3):
+            app.find_imdb_title_url("Sommaren med Monika", 1953)
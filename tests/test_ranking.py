@@ -0,0 +1,78 @@
+"""TopKPruner ska ge exakt samma topp-k som en full sortering av alla kandidaters slutliga nycklar."""
+
+import random
+
+import pytest
+
+from ranking import TopKPruner
+
+
+def random_candidates(rng, count):
+    """(optimistisk, pessimistisk, exakt) nyckel per kandidat, som i app._rank_live_candidates.
+
+    Lägre nyckel är bättre och nycklarna slutar med index, så de är totalt ordnade.
+    Originaltiteln kan bara förbättra placeringen: optimistisk <= exakt <= pessimistisk.
+    Få olika poäng ger många lika nycklar som bara skiljs åt av indexet.
+    """
+    candidates = []
+    for i in range(count):
+        optimistic = (rng.randint(0, 3), i)
+        exact = (rng.randint(optimistic[0], 6), i) if rng.random() < 0.8 else None
+        pessimistic = None
+        if exact is not None and rng.random() < 0.6:
+            pessimistic = (rng.randint(exact[0], 6), i)
+        candidates.append((optimistic, pessimistic, exact))
+    return candidates
+
+
+def run_pruner(rng, candidates, k, budget=None):
+    """Kör pruner som sökningen gör: några hämtningar åt gången, klara i slumpvis ordning."""
+    pruner = TopKPruner(k, budget=budget)
+    for i, (optimistic, pessimistic, _) in enumerate(candidates):
+        pruner.add(i, optimistic, pessimistic)
+    in_flight = []
+    fetched = []
+    while True:
+        in_flight.extend(pruner.take(rng.randint(1, 4) - len(in_flight) if len(in_flight) < 4 else 0))
+        if not in_flight: break
+        i = in_flight.pop(rng.randrange(len(in_flight)))
+        fetched.append(i)
+        pruner.settle(i, candidates[i][2])
+    return pruner, fetched
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_full_sort(seed):
+    rng = random.Random(seed)
+    candidates = random_candidates(rng, rng.randint(0, 30))
+    k = rng.randint(1, 8)
+    pruner, fetched = run_pruner(rng, candidates, k)
+
+    expected = sorted(exact for _, _, exact in candidates if exact is not None)[:k]
+    got = sorted(candidates[i][2] for i in fetched if candidates[i][2] is not None)[:k]
+    assert got == expected
+    assert sorted(fetched + pruner.pruned) == list(range(len(candidates)))
+    assert pruner.unfetched() == []
+
+
+def test_k_larger_than_candidate_count_fetches_everything():
+    rng = random.Random(1)
+    candidates = random_candidates(rng, 5)
+    pruner, fetched = run_pruner(rng, candidates, k=10)
+    assert sorted(fetched) == list(range(5))
+    assert pruner.pruned == []
+
+
+def test_all_tied_keeps_lowest_indexes():
+    candidates = [((0, i), (1, i), (1, i)) for i in range(10)]
+    pruner, fetched = run_pruner(random.Random(2), candidates, k=3)
+    expected = [(1, 0), (1, 1), (1, 2)]
+    assert sorted(candidates[i][2] for i in fetched)[:3] == expected
+
+
+def test_budget_limits_fetches():
+    rng = random.Random(3)
+    candidates = random_candidates(rng, 20)
+    pruner, fetched = run_pruner(rng, candidates, k=3, budget=5)
+    assert len(fetched) == pruner.fetched <= 5
+    assert sorted(fetched + pruner.pruned + pruner.unfetched()) == list(range(20))
@@ -0,0 +1,112 @@
+"""SingleFlight: delade resultat och fel, och att varje väntande anropare håller sin egen tidsbudget."""
+
+import threading
+import time
+
+import pytest
+
+import deadline
+from singleflight import SingleFlight
+
+
+def start_leader(flight, key, func):
+    """Startar ledaren i en egen tråd och väntar tills anropet är registrerat."""
+    outcome = {}
+    started = threading.Event()
+
+    def wrapped():
+        started.set()
+        return func()
+
+    def run():
+        try:
+            outcome["result"] = flight.do(key, wrapped)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    started.wait(5)
+    return thread, outcome
+
+
+def test_followers_share_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    thread, outcome = start_leader(flight, "k", lambda: release.wait(5) and "svar")
+    follower = threading.Thread(target=lambda: outcome.setdefault("follower", flight.do("k", lambda: "eget")))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    thread.join(5)
+    follower.join(5)
+    assert outcome["result"] == outcome["follower"] == "svar"
+    assert flight.get_stats() == {"calls": 2, "executed": 1, "shared": 1, "in_flight": 0}
+
+
+def test_leader_failure_is_shared():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("trasig sida")
+
+    thread, outcome = start_leader(flight, "k", fail)
+    errors = []
+
+    def follow():
+        try:
+            flight.do("k", lambda: "eget")
+        except ValueError as e:
+            errors.append(e)
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    thread.join(5)
+    follower.join(5)
+    assert isinstance(outcome["error"], ValueError)
+    assert len(errors) == 1 and errors[0] is outcome["error"]
+
+
+def test_follower_gives_up_at_its_own_deadline():
+    flight = SingleFlight()
+    release = threading.Event()
+    thread, outcome = start_leader(flight, "k", lambda: release.wait(5) and "svar")
+    try:
+        started = time.monotonic()
+        with deadline.within(0.2):
+            with pytest.raises(deadline.DeadlineExceeded):
+                flight.do("k", lambda: "eget")
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+        thread.join(5)
+    assert outcome["result"] == "svar"
+
+
+def test_follower_retries_when_leader_runs_out_of_time():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def leader_times_out():
+        release.wait(5)
+        raise deadline.DeadlineExceeded("ledarens budget är slut")
+
+    thread, outcome = start_leader(flight, "k", leader_times_out)
+    result = {}
+
+    def follow():
+        with deadline.within(5):
+            result["value"] = flight.do("k", lambda: "eget")
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    thread.join(5)
+    follower.join(5)
+    assert isinstance(outcome["error"], deadline.DeadlineExceeded)
+    assert result["value"] == "eget"
@@ -0,0 +1,67 @@
+"""TitleIndex byggt från de sparade SFDb-filmsidorna i bench/fixtures/sfdb_film."""
+
+import os
+
+import pytest
+
+from scoring import normalize_title
+from title_index import TitleIndex, title_grams
+
+FILM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "bench", "fixtures", "sfdb_film")
+FILM_COUNT = len([name for name in os.listdir(FILM_DIR) if name.endswith(".html")])
+
+
+@pytest.fixture
+def index(tmp_path):
+    title_index = TitleIndex(str(tmp_path / "sfdb_index.sqlite3"), normalize_title)
+    assert title_index.build_from_directory(FILM_DIR) == FILM_COUNT
+    yield title_index
+    title_index.close()
+
+
+def itemids(results):
+    return [result["itemid"] for result in results]
+
+
+def test_build_indexes_every_fixture_page(index):
+    assert len(index) == FILM_COUNT
+    # Att bygga om ersätter filmerna i stället för att lägga till dubbletter
+    index.build_from_directory(FILM_DIR)
+    assert len(index) == FILM_COUNT
+
+
+def test_exact_title_is_best_hit(index):
+    results = index.search("Sommaren med Monika")
+    assert results[0] == {"itemid": "3001", "title": "Sommaren med Monika", "original_title": "Sommaren med Monika",
+                          "year": 1953, "dcp": True}
+    assert itemids(index.search("Fucking Åmål"))[0] == "3007"
+
+
+@pytest.mark.parametrize("query, itemid", [
+    ("Sommaren med Monica", "3001"), # Stavfel: trigram
+    ("Smultronstallet", "3008"), # Utan diakritiska tecken
+    ("Det sjunde insegel", "3006"), # Ofullständigt ord
+    ("sommarnattens LEENDE", "3002"), # Skiftläge
+])
+def test_fuzzy_queries_find_the_film(index, query, itemid):
+    assert itemids(index.search(query))[0] == itemid
+
+
+def test_related_titles_are_ranked_after_the_best_hit(index):
+    hits = itemids(index.search("Sommaren med Monika"))
+    assert hits[0] == "3001"
+    assert "3005" in hits[1:] # "Sommaren" delar ord och trigram
+
+
+@pytest.mark.parametrize("query", ["Fanny och Alexander", "xyz", ""])
+def test_no_hits(index, query):
+    assert index.search(query) == []
+
+
+def test_limit(index):
+    assert len(index.search("Sommar", limit=2, min_overlap=0)) == 2
+
+
+def test_title_grams_include_words_and_padded_trigrams():
+    grams = title_grams("sommar lek")
+    assert {"#sommar", "#lek", "  s", " so", "som", "ar ", "  l", "lek", "ek "} <= grams
@@ -0,0 +1,143 @@
+# --- Tumnagelcache för postrar ---
+# IMDb-postrar är ofta flera hundra KB stora. Varje poster hämtas en gång,
+# skalas ned till några fasta bredder och sparas som WebP/JPEG i en
+# katalog på disk med storlekstak; äldst använda filer tas bort först (LRU via
+# filernas mtime). Pillow är valfritt: utan det finns ingen cache och anroparen
+# får falla tillbaka på originalbilden.
+
+import hashlib
+import io
+import logging
+import os
+import threading
+
+from metrics import REGISTRY
+from singleflight import SingleFlight
+
+try:
+    from PIL import Image, features
+    PIL_AVAILABLE = True
+    WEBP_AVAILABLE = features.check('webp')
+except ImportError:
+    PIL_AVAILABLE = False
+    WEBP_AVAILABLE = False
+
+THUMB_WIDTHS = (150, 300) # 1x och 2x av postrarnas 150px i mallarna
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+THUMBNAIL_REQUESTS = REGISTRY.counter(
+    "dcp_thumbnail_requests_total", "Tumnagelförfrågningar per utfall (hit/generated/error).", ("outcome",))
+
+
+def snap_width(width):
+    """Närmaste tillåtna bredd som är minst `width` (annars den största)."""
+    for allowed in THUMB_WIDTHS:
+        if width <= allowed: return allowed
+    return THUMB_WIDTHS[-1]
+
+
+def pick_format(accept_header):
+    """WebP om webbläsaren accepterar det och Pillow kan skriva det, annars JPEG."""
+    return "webp" if WEBP_AVAILABLE and "image/webp" in (accept_header or "") else "jpeg"
+
+
+class Thumbnail:
+    def __init__(self, path, mimetype, etag):
+        self.path = path
+        self.mimetype = mimetype
+        self.etag = etag
+
+
+class ThumbnailCache:
+    """Skalade postrar på disk, nycklade på (itemid, bredd, format, käll-URL).
+
+    `fetch(url, timeout=...)` hämtar originalbilden (requests-liknande svar med .content).
+    """
+
+    def __init__(self, directory, max_bytes, fetch, timeout=15):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fetch = fetch
+        self.timeout = timeout
+        self.flight = SingleFlight() # Samtidiga förfrågningar på samma tumnagel skapar den en gång
+        self._lock = threading.Lock()
+        self._total_bytes = None # Räknas upp vid första användning
+
+    def _scan(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file() and not entry.name.endswith('.tmp'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _evict(self, added_bytes):
+        """Lägger till `added_bytes` i totalen och tar bort äldst använda filer över taket."""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += added_bytes
+            if self._total_bytes <= self.max_bytes: return
+            for _, size, path in sorted(self._scan()):
+                if self._total_bytes <= self.max_bytes * 0.9: break # Lite marginal så att vi inte rensar vid varje ny fil
+                try:
+                    os.remove(path)
+                    self._total_bytes -= size
+                except OSError:
+                    pass
+
+    def _path_for(self, itemid, width, fmt, source_url):
+        source_hash = hashlib.sha1(source_url.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.directory, f"{itemid}_{width}_{source_hash}.{fmt}"), source_hash
+
+    def get(self, itemid, source_url, width, fmt):
+        """Returnerar en Thumbnail (skapas vid behov). Kastar vid nätverks- eller bildfel."""
+        path, source_hash = self._path_for(itemid, width, fmt, source_url)
+        thumbnail = Thumbnail(path, FORMATS[fmt][1], f"{itemid}-{width}-{source_hash}-{fmt}")
+        if os.path.exists(path):
+            try:
+                os.utime(path) # Markera som nyligen använd för LRU
+            except OSError:
+                pass
+            THUMBNAIL_REQUESTS.inc(outcome="hit")
+            return thumbnail
+        self.flight.do(path, self._create, path, source_url, width, fmt)
+        return thumbnail
+
+    def _create(self, path, source_url, width, fmt):
+        if os.path.exists(path): return # Skapad av en tidigare ledare medan vi väntade
+        try:
+            response = self.fetch(source_url, timeout=self.timeout)
+            response.raise_for_status()
+            data = self.render(response.content, width, fmt)
+        except Exception:
+            THUMBNAIL_REQUESTS.inc(outcome="error")
+            raise
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path) # Atomiskt: läsare ser aldrig en halvskriven fil
+        THUMBNAIL_REQUESTS.inc(outcome="generated")
+        logging.debug("Skapade tumnagel %s (%d byte från %d)", path, len(data), len(response.content))
+        self._evict(len(data))
+
+    @staticmethod
+    def render(image_bytes, width, fmt):
+        """Skalar ned (aldrig upp) till `width` med bibehållna proportioner och kodar om."""
+        pil_format, _, options = FORMATS[fmt]
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image = image.convert("RGB")
+            if image.width > width:
+                image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            out = io.BytesIO()
+            image.save(out, pil_format, **options)
+            return out.getvalue()
@@ -0,0 +1,135 @@
+# --- Lokalt titelindex för SFDb ---
+# Ett kompakt SQLite-index över SFDb-filmer (itemid, svensk titel, originaltitel,
+# år, DCP) med ett inverterat index av trigram och hela ord över de normaliserade
+# titlarna. search_movie kan då ta fram och poängsätta kandidater lokalt och bara
+# falla tillbaka på SFDb:s egen sökning när indexet inte har någon bra träff.
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+from sfdb_page import SfdbMoviePage
+
+
+def title_grams(normalized_title):
+    """Trigram (med utfyllnad) plus hela ord ('#ord') för en normaliserad titel."""
+    grams = set()
+    for word in normalized_title.split():
+        grams.add('#' + word)
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TitleIndex:
+    """Läser och skriver titelindexet. `normalize` ska vara samma normalisering som vid poängsättning."""
+
+    def __init__(self, path, normalize):
+        self.path = path
+        self.normalize = normalize
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS films ("
+            " itemid TEXT PRIMARY KEY, title TEXT, original_title TEXT, year INTEGER, dcp INTEGER);"
+            "CREATE TABLE IF NOT EXISTS grams ("
+            " gram TEXT, itemid TEXT, PRIMARY KEY (gram, itemid)) WITHOUT ROWID;"
+        )
+
+    # --- Bygga ---
+
+    def add_film(self, itemid, title, original_title=None, year=None, dcp=None):
+        """Lägger till (eller ersätter) en film och dess titelgram."""
+        grams = title_grams(self.normalize(title or ""))
+        if original_title:
+            grams |= title_grams(self.normalize(original_title))
+        with self._lock:
+            self._db.execute("DELETE FROM grams WHERE itemid = ?", (itemid,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO films (itemid, title, original_title, year, dcp) VALUES (?, ?, ?, ?, ?)",
+                (itemid, title, original_title, year, None if dcp is None else int(dcp)),
+            )
+            self._db.executemany("INSERT OR IGNORE INTO grams (gram, itemid) VALUES (?, ?)", [(gram, itemid) for gram in grams])
+
+    def add_page(self, itemid, movie_page):
+        """Lägger till en film från en parsad SfdbMoviePage."""
+        if not movie_page.title and not movie_page.original_title:
+            logging.warning(f"Hoppar över {itemid}: ingen titel på sidan.")
+            return False
+        self.add_film(itemid, movie_page.title or movie_page.original_title, movie_page.original_title,
+                      movie_page.year, movie_page.dcp_available)
+        return True
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def build_from_directory(self, directory):
+        """Indexerar alla sparade SFDb-filmsidor (*.html) i en katalog. Returnerar antal filmer.
+
+        itemid tas från sidans kanoniska URL och annars från filnamnet (t.ex. 12345.html).
+        """
+        count = 0
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.html'): continue
+            path = os.path.join(directory, filename)
+            with open(path, encoding='utf-8') as f:
+                html = f.read()
+            movie_page = SfdbMoviePage(path, html)
+            filename_match = re.search(r'(\d+)', filename)
+            itemid = movie_page.itemid or (filename_match.group(1) if filename_match else None)
+            if not itemid:
+                logging.warning(f"Hittade inget itemid för {path}, hoppar över.")
+                continue
+            if self.add_page(itemid, movie_page):
+                count += 1
+        self.commit()
+        logging.info(f"Indexerade {count} filmer från {directory}.")
+        return count
+
+    # --- Söka ---
+
+    def search(self, title, limit=30, min_overlap=0.3):
+        """Kandidater för en söktitel, bäst överlapp först.
+
+        Returnerar dicts med itemid, title, original_title, year och dcp. Kandidater
+        som delar mindre än `min_overlap` av sökningens gram tas inte med.
+        """
+        query_grams = title_grams(self.normalize(title))
+        if not query_grams: return []
+        placeholders = ",".join("?" * len(query_grams))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT itemid FROM grams WHERE gram IN ({placeholders})", tuple(query_grams)
+            ).fetchall()
+        overlap = Counter(itemid for (itemid,) in rows)
+        needed = len(query_grams) * min_overlap
+        best = [itemid for itemid, hits in overlap.most_common() if hits >= needed][:limit]
+        if not best: return []
+        with self._lock:
+            films = self._db.execute(
+                f"SELECT itemid, title, original_title, year, dcp FROM films WHERE itemid IN ({','.join('?' * len(best))})",
+                tuple(best),
+            ).fetchall()
+        by_itemid = {row[0]: row for row in films}
+        results = []
+        for itemid in best:
+            row = by_itemid.get(itemid)
+            if not row: continue
+            results.append({
+                "itemid": row[0], "title": row[1], "original_title": row[2], "year": row[3],
+                "dcp": None if row[4] is None else bool(row[4]),
+            })
+        return results
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM films").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,216 @@
+# --- Bevakningslista för DCP-släpp ---
+# Filmer som väntar på en DCP-version kontrolleras om periodiskt av en
+# bakgrundstråd. Varje kontroll är en villkorlig GET (ETag/Last-Modified) och
+# sidans innehåll hashas, så oförändrade sidor varken parsas eller kontrolleras
+# igen. Aktuell status och historik (varje innehålls- eller statusändring)
+# sparas i SQLite, så /watchlist kan svara direkt utan att skrapa.
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+import requests
+
+from metrics import REGISTRY
+
+WATCHLIST_CHECKS = REGISTRY.counter(
+    "dcp_watchlist_checks_total", "Kontroller av bevakade filmer per utfall.", ("outcome",))
+
+ENTRY_COLUMNS = ("itemid", "url", "title", "dcp_available", "added_at", "checked_at", "changed_at",
+                 "available_since", "error")
+
+
+class Watchlist:
+    """Bevakade SFDb-itemid med senaste DCP-status, plus schemaläggare för omkontroll.
+
+    `fetch(url, headers=..., timeout=...)` gör HTTP-anropet (requests-liknande svar) och
+    `inspect(url, html)` returnerar (titel, dcp_tillgänglig) för en hämtad filmsida.
+    `url_for(itemid)` bygger filmsidans URL. interval=0 stänger av schemaläggaren.
+    """
+
+    def __init__(self, db_path, fetch, inspect, url_for, interval=3600, timeout=15):
+        self.db_path = db_path or ":memory:"
+        self.fetch = fetch
+        self.inspect = inspect
+        self.url_for = url_for
+        self.interval = interval
+        self.timeout = timeout
+        self._db_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._db = None # Öppnas vid första användning, så att import av appen inte skapar filen
+
+    def _connect(self):
+        # Anropas med _db_lock hållet
+        if self._db is not None: return self._db
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS watchlist ("
+            " itemid TEXT PRIMARY KEY, url TEXT, title TEXT, dcp_available INTEGER,"
+            " added_at REAL, checked_at REAL, changed_at REAL, available_since REAL, error TEXT,"
+            " etag TEXT, last_modified TEXT, content_hash TEXT);"
+            "CREATE TABLE IF NOT EXISTS history ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, itemid TEXT, checked_at REAL,"
+            " dcp_available INTEGER, content_hash TEXT, flipped INTEGER);"
+            "CREATE INDEX IF NOT EXISTS history_itemid ON history (itemid, checked_at);"
+        )
+        self._db.commit()
+        return self._db
+
+    # --- Lagring ---
+
+    def _execute(self, sql, params=()):
+        with self._db_lock:
+            db = self._connect()
+            cursor = db.execute(sql, params)
+            db.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._db_lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    @staticmethod
+    def _entry(row):
+        entry = dict(zip(ENTRY_COLUMNS, row))
+        if entry["dcp_available"] is not None:
+            entry["dcp_available"] = bool(entry["dcp_available"])
+        return entry
+
+    def add(self, itemid, title=None):
+        """Lägger till en film (ingen ändring om den redan bevakas) och väcker schemaläggaren."""
+        self._execute(
+            "INSERT OR IGNORE INTO watchlist (itemid, url, title, added_at) VALUES (?, ?, ?, ?)",
+            (itemid, self.url_for(itemid), title, time.time()),
+        )
+        self._wake.set() # Nya filmer kontrolleras direkt i stället för vid nästa intervall
+
+    def remove(self, itemid):
+        """Tar bort en film och dess historik. Returnerar True om den fanns."""
+        removed = self._execute("DELETE FROM watchlist WHERE itemid = ?", (itemid,)).rowcount > 0
+        self._execute("DELETE FROM history WHERE itemid = ?", (itemid,))
+        return removed
+
+    def get(self, itemid):
+        rows = self._query(f"SELECT {', '.join(ENTRY_COLUMNS)} FROM watchlist WHERE itemid = ?", (itemid,))
+        return self._entry(rows[0]) if rows else None
+
+    def entries(self):
+        """Alla bevakade filmer, tillgängliga först och sedan senast tillagda."""
+        rows = self._query(
+            f"SELECT {', '.join(ENTRY_COLUMNS)} FROM watchlist"
+            " ORDER BY dcp_available IS NOT 1, available_since DESC, added_at DESC"
+        )
+        return [self._entry(row) for row in rows]
+
+    def history(self, itemid=None, flips_only=False, limit=50):
+        """Senaste historikraderna, valfritt för en film och/eller bara statusändringar."""
+        conditions, params = [], []
+        if itemid is not None:
+            conditions.append("h.itemid = ?")
+            params.append(itemid)
+        if flips_only:
+            conditions.append("h.flipped = 1")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._query(
+            "SELECT h.itemid, w.title, h.checked_at, h.dcp_available, h.flipped FROM history h"
+            f" LEFT JOIN watchlist w ON w.itemid = h.itemid{where} ORDER BY h.checked_at DESC LIMIT ?",
+            params + [limit],
+        )
+        return [{"itemid": itemid, "title": title, "checked_at": checked_at,
+                 "dcp_available": bool(dcp_available), "flipped": bool(flipped)}
+                for itemid, title, checked_at, dcp_available, flipped in rows]
+
+    # --- Kontroll ---
+
+    def check(self, itemid):
+        """Kontrollerar en bevakad film. Returnerar utfallet (not_modified/unchanged/changed/error)."""
+        rows = self._query(
+            "SELECT url, dcp_available, etag, last_modified, content_hash FROM watchlist WHERE itemid = ?", (itemid,))
+        if not rows: return None
+        url, previous_status, etag, last_modified, previous_hash = rows[0]
+        now = time.time()
+
+        headers = {}
+        if etag: headers['If-None-Match'] = etag
+        if last_modified: headers['If-Modified-Since'] = last_modified
+        try:
+            response = self.fetch(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and previous_hash:
+                outcome = "not_modified"
+            else:
+                response.raise_for_status()
+                content_hash = hashlib.sha256(response.content).hexdigest()
+                outcome = "unchanged" if content_hash == previous_hash else "changed"
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Bevakning: kunde inte hämta {url}: {e}")
+            self._execute("UPDATE watchlist SET checked_at = ?, error = ? WHERE itemid = ?", (now, str(e), itemid))
+            WATCHLIST_CHECKS.inc(outcome="error")
+            return "error"
+
+        WATCHLIST_CHECKS.inc(outcome=outcome)
+        if outcome != "changed":
+            self._execute(
+                "UPDATE watchlist SET checked_at = ?, error = NULL,"
+                " etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE itemid = ?",
+                (now, response.headers.get('ETag'), response.headers.get('Last-Modified'), itemid),
+            )
+            return outcome
+
+        # Innehållet har ändrats: parsa och kontrollera DCP på nytt
+        title, dcp_available = self.inspect(url, response.text)
+        flipped = previous_status is not None and bool(previous_status) != dcp_available
+        if flipped and dcp_available:
+            logging.info(f"Bevakning: DCP nu tillgänglig för {itemid} ({title})")
+        available_since = now if dcp_available and not previous_status else None
+        self._execute(
+            "UPDATE watchlist SET title = COALESCE(?, title), dcp_available = ?, checked_at = ?, changed_at = ?,"
+            " available_since = CASE WHEN ? THEN COALESCE(?, available_since) ELSE NULL END, error = NULL,"
+            " etag = ?, last_modified = ?, content_hash = ? WHERE itemid = ?",
+            (title, int(dcp_available), now, now, int(dcp_available), available_since,
+             response.headers.get('ETag'), response.headers.get('Last-Modified'), content_hash, itemid),
+        )
+        self._execute(
+            "INSERT INTO history (itemid, checked_at, dcp_available, content_hash, flipped) VALUES (?, ?, ?, ?, ?)",
+            (itemid, now, int(dcp_available), content_hash, int(flipped)),
+        )
+        return outcome
+
+    def due(self, now=None):
+        """Itemid som aldrig kontrollerats eller vars senaste kontroll är äldre än intervallet."""
+        cutoff = (now or time.time()) - self.interval
+        return [itemid for (itemid,) in self._query(
+            "SELECT itemid FROM watchlist WHERE checked_at IS NULL OR checked_at <= ? ORDER BY checked_at", (cutoff,))]
+
+    def refresh(self, itemids=None):
+        """Kontrollerar angivna (standard: alla förfallna) filmer i tur och ordning. Returnerar utfall per itemid."""
+        results = {}
+        for itemid in (self.due() if itemids is None else itemids):
+            try:
+                results[itemid] = self.check(itemid)
+            except Exception as e:
+                logging.error(f"Bevakning: fel vid kontroll av {itemid}: {e}")
+                results[itemid] = "error"
+        return results
+
+    # --- Schemaläggare ---
+
+    def start(self):
+        """Startar bakgrundstråden (om intervallet är satt och den inte redan körs)."""
+        if self.interval <= 0 or self._thread is not None: return
+        with self._db_lock:
+            if self._thread is not None: return
+            self._thread = threading.Thread(target=self.run, name="watchlist-refresher", daemon=True)
+            self._thread.start()
+
+    def run(self):
+        """Schemaläggarens loop; körs av start() i en bakgrundstråd eller i förgrunden av CLI:t."""
+        while True:
+            self._wake.clear()
+            results = self.refresh()
+            if results:
+                logging.info(f"Bevakning: kontrollerade {len(results)} filmer")
+            # Förfallna filmer letas upp minst en gång i minuten, och direkt när en film läggs till
+            self._wake.wait(timeout=max(1, min(self.interval, 60)))